@@ -0,0 +1,35 @@
+"""Agents built on first use instead of at import.
+
+Importing the agents SDK takes a couple of seconds, and most processes that import the research
+code (the Streamlit app, which hands research to the worker pool) never run an agent. Each agent
+module has a `build_agent()`; the registry calls it the first time an agent is asked for and again
+once the date has changed, so the date in the agent's instructions stays current.
+"""
+import importlib
+import threading
+from datetime import date
+
+# Registry name -> module providing build_agent()
+AGENT_MODULES = {
+    "planner": "planner_agent",
+    "search": "search_agent",
+    "writer": "writer_agent",
+    "section_writer": "section_writer_agent",
+    "email": "email_agent",
+    "clarify": "clarify_agent",
+    "followup": "followup_agent",
+}
+
+_lock = threading.Lock()
+_agents: dict = {}
+
+
+def get_agent(name: str):
+    """The named agent, built for today's date"""
+    today = date.today()
+    with _lock:
+        built = _agents.get(name)
+        if built is None or built[0] != today:
+            module = importlib.import_module(AGENT_MODULES[name])
+            built = _agents[name] = (today, module.build_agent())
+        return built[1]
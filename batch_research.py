@@ -0,0 +1,177 @@
+"""Headless batch research: run many queries from a file and write their reports to a directory.
+
+    python batch_research.py queries.jsonl --out reports/2026-w42 --concurrency 8
+
+A JSONL file has one object per line with a "query" and optionally an "id"; a CSV file needs a
+"query" column and may have an "id" column. Ids must be distinct. Each report is written to
+<out>/<id>.md and a line of per-stage timings is appended to <out>/timings.jsonl as each query
+finishes.
+
+Queries run up to `concurrency` at a time in one event loop, sharing one search cache and the
+process-wide search scheduler, so searches stay within the provider limits however many queries
+run. Each query's checkpoint run id is derived from the output directory, its id and its text:
+running the same command again after an interruption skips the finished queries and resumes the
+others from their last completed stage.
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import config  # noqa: F401
+import chat_db
+import research_checkpoints as checkpoints
+from research_metrics import init_metrics, run_stages
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 4))
+TIMINGS_FILE = "timings.jsonl"
+
+
+def load_queries(path: str) -> List[dict]:
+    """[{"id", "query"}] from a JSONL or CSV file; queries without an id get one from their text"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    queries = []
+    for row in rows:
+        query = (row.get("query") or "").strip()
+        if not query:
+            continue
+        query_id = str(row.get("id") or "").strip() or hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        queries.append({"id": query_id, "query": query})
+    return queries
+
+
+def batch_run_id(out_dir: str, query_id: str, query: str) -> str:
+    """Stable checkpoint run id, so a rerun of the same batch resumes instead of starting over"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"batch:{os.path.abspath(out_dir)}:{query_id}:{query}"))
+
+
+def report_path(out_dir: str, query_id: str) -> str:
+    return os.path.join(out_dir, re.sub(r"[^\w.-]+", "_", query_id) + ".md")
+
+
+def check_unique_ids(queries: List[dict], out_dir: str):
+    """Raise ValueError if two queries would write the same report file"""
+    seen, duplicates = {}, []
+    for item in queries:
+        path = report_path(out_dir, item["id"])
+        if path in seen:
+            duplicates.append(f"{seen[path]!r} and {item['id']!r}" if seen[path] != item["id"] else repr(item["id"]))
+        seen.setdefault(path, item["id"])
+    if duplicates:
+        raise ValueError(f"Queries need distinct ids, these would overwrite each other's report: {', '.join(duplicates)}")
+
+
+def _new_manager(search_cache):
+    from research_manager import ResearchManager
+    return ResearchManager(
+        search_cache=search_cache,
+        pipelined=True,
+        search_deadline=float(os.environ.get("SEARCH_DEADLINE_SECONDS", 90)),
+    )
+
+
+async def _run_query(item: dict, out_dir: str, manager_factory: Callable, search_cache,
+                     semaphore: asyncio.Semaphore) -> dict:
+    run_id = batch_run_id(out_dir, item["id"], item["query"])
+    manager = None
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            manager = manager_factory(search_cache)
+            async for _ in manager.run(item["query"], run_id=run_id):
+                pass
+            report = checkpoints.load_report(run_id)
+            with open(report_path(out_dir, item["id"]), "w", encoding="utf-8") as f:
+                f.write(report.markdown_report)
+            status, error = "completed", None
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start
+    return {
+        "id": item["id"], "query": item["query"], "run_id": run_id, "status": status, "error": error,
+        "seconds": round(seconds, 3), "dropped_searches": len(manager.dropped_searches) if manager else 0,
+        "stages": run_stages(run_id),
+    }
+
+
+async def run_batch(queries: List[dict], out_dir: str, concurrency: int = BATCH_CONCURRENCY,
+                    manager_factory: Optional[Callable] = None, progress: Callable[[str], None] = print) -> List[dict]:
+    """Research every query not already finished in `out_dir`; returns the timing record of each query run"""
+    from search_cache import SearchCache
+
+    check_unique_ids(queries, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    chat_db.init_db()
+    checkpoints.init_checkpoints()
+    init_metrics()
+    search_cache = SearchCache()
+    manager_factory = manager_factory or _new_manager
+
+    pending = []
+    for item in queries:
+        run = checkpoints.get_run(batch_run_id(out_dir, item["id"], item["query"]))
+        if run and run["status"] == "completed" and os.path.exists(report_path(out_dir, item["id"])):
+            continue
+        pending.append(item)
+    if len(pending) < len(queries):
+        progress(f"♻️ {len(queries) - len(pending)} of {len(queries)} queries already done, skipping them")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.create_task(_run_query(item, out_dir, manager_factory, search_cache, semaphore))
+        for item in pending
+    ]
+    timings = []
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(out_dir, TIMINGS_FILE), "a", encoding="utf-8") as timings_file:
+            for finished in asyncio.as_completed(tasks):
+                timing = await finished
+                timings.append(timing)
+                timings_file.write(json.dumps(timing) + "\n")
+                timings_file.flush()
+                mark = "✅" if timing["status"] == "completed" else "❌"
+                progress(f"[{len(timings)}/{len(pending)}] {mark} {timing['id']} in {timing['seconds']:.1f}s"
+                         + (f": {timing['error']}" if timing["error"] else ""))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if timings:
+        elapsed = time.perf_counter() - start
+        failed = sum(timing["status"] != "completed" for timing in timings)
+        progress(f"Finished {len(timings)} queries ({failed} failed) in {elapsed:.1f}s, "
+                 f"{len(timings) / elapsed * 3600:.0f} per hour")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run research queries from a JSONL or CSV file without the UI")
+    parser.add_argument("queries", help="JSONL or CSV file of queries")
+    parser.add_argument("--out", required=True, help="Directory for the reports and timings.jsonl")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="How many queries to research at once")
+    args = parser.parse_args()
+    queries = load_queries(args.queries)
+    try:
+        check_unique_ids(queries, args.out)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        asyncio.run(run_batch(queries, args.out, args.concurrency))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Time the chat_db calls a single Streamlit rerun makes, with and without the pooled connections.
+
+    python benchmarks/bench_chat_db.py --sessions 200 --messages 20 --reruns 200 --threads 4
+
+Streamlit runs every rerun in a new script thread, so each rerun here runs in its own thread,
+`--threads` at a time.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_db
+
+
+def seed(sessions: int, messages: int, report_size: int) -> list[str]:
+    session_ids = []
+    for i in range(sessions):
+        session_id = chat_db.start_session(f"Session {i}")
+        chat_db.save_messages(session_id, [
+            ("user" if j % 2 == 0 else "assistant", "x" * (80 if j % 2 == 0 else report_size))
+            for j in range(messages)
+        ])
+        session_ids.append(session_id)
+    return session_ids
+
+
+def rerun_pooled(session_id: str):
+    chat_db.init_db()
+    chat_db.get_all_sessions()
+    chat_db.get_session_name(session_id)
+    chat_db.get_chat_history(session_id)
+
+
+def rerun_unpooled(session_id: str):
+    """The same calls made the way chat_db did before pooling: one fresh connection per call"""
+    def query(sql, params=()):
+        with sqlite3.connect(chat_db.DB_PATH) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    rerun_queries(query, session_id)
+
+
+def rerun_per_thread(session_id: str):
+    """The same calls on one connection opened for the rerun's thread, as a thread-local connection without a pool"""
+    conn = sqlite3.connect(chat_db.DB_PATH, timeout=30, cached_statements=256)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    try:
+        rerun_queries(lambda sql, params=(): conn.execute(sql, params).fetchall(), session_id)
+    finally:
+        conn.close()
+
+
+def rerun_queries(query, session_id: str):
+    query("PRAGMA table_info(chat_sessions)")
+    query("""SELECT session_id, COALESCE(session_name, 'Session ' || substr(session_id, 1, 8)),
+                    created_at, COALESCE(last_message_at, created_at)
+             FROM chat_sessions ORDER BY COALESCE(last_message_at, created_at) DESC""")
+    query("SELECT session_name FROM chat_sessions WHERE session_id = ?", (session_id,))
+    query("SELECT role, content, timestamp FROM chat_messages WHERE session_id = ? ORDER BY timestamp", (session_id,))
+
+
+def measure(label: str, fn, session_ids: list[str], reruns: int, threads: int):
+    timings = []
+
+    def rerun(i: int):
+        start = time.perf_counter()
+        fn(session_ids[i % len(session_ids)])
+        timings.append(time.perf_counter() - start)
+
+    for batch in range(0, reruns, threads):
+        workers = [threading.Thread(target=rerun, args=(i,)) for i in range(batch, min(reruns, batch + threads))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<10} mean {mean * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--report-size", type=int, default=8000)
+    parser.add_argument("--reruns", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4, help="Reruns running at once, each in its own thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_db.DB_PATH = os.path.join(tmp, "bench.db")
+        chat_db.init_db()
+        session_ids = seed(args.sessions, args.messages, args.report_size)
+        measure("unpooled", rerun_unpooled, session_ids, args.reruns, args.threads)
+        measure("per thread", rerun_per_thread, session_ids, args.reruns, args.threads)
+        measure("pooled", rerun_pooled, session_ids, args.reruns, args.threads)
+        chat_db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
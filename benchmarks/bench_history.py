@@ -0,0 +1,93 @@
+"""Time chat_db's read and write paths against a history of realistic size.
+
+    python benchmarks/bench_history.py --sessions 500 --messages 40 --report-size 12000
+
+Each session alternates short questions with long generated reports; every report is different,
+so the compressed content store and the full-text index hold as much as they would in use.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_db
+
+VOCABULARY = (
+    "quantum error correction battery chemistry solid state lithium regulation market forecast "
+    "adoption semiconductor supply chain climate policy vaccine trial protein folding inference "
+    "latency benchmark compiler database index transformer robotics fusion reactor satellite"
+).split()
+
+
+def text(rng: random.Random, chars: int) -> str:
+    words, length = [], 0
+    while length < chars:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def seed(rng: random.Random, sessions: int, messages: int, report_size: int) -> list[str]:
+    session_ids = []
+    for i in range(sessions):
+        session_id = chat_db.start_session(f"Session {i}")
+        chat_db.save_messages(session_id, [
+            ("user", text(rng, 120)) if j % 2 == 0 else ("assistant", text(rng, report_size))
+            for j in range(messages)
+        ])
+        session_ids.append(session_id)
+    return session_ids
+
+
+def measure(label: str, fn, repeats: int):
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    pick = lambda pct: timings[min(len(timings) - 1, int(len(timings) * pct))] * 1000
+    print(f"{label:<22} mean {sum(timings) / len(timings) * 1000:8.3f} ms   p50 {pick(0.5):8.3f}   "
+          f"p95 {pick(0.95):8.3f}   p99 {pick(0.99):8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=30)
+    parser.add_argument("--report-size", type=int, default=12000)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_db.DB_PATH = os.path.join(tmp, "bench.db")
+        chat_db.init_db()
+        start = time.perf_counter()
+        session_ids = seed(rng, args.sessions, args.messages, args.report_size)
+        size = os.path.getsize(chat_db.DB_PATH) / 2**20
+        print(f"seeded {args.sessions} sessions x {args.messages} messages in {time.perf_counter() - start:.1f} s, "
+              f"database {size:.1f} MiB")
+
+        session = lambda i: session_ids[i % len(session_ids)]
+        reports = [text(rng, args.report_size) for _ in range(16)]
+        measure("save_message user", lambda i: chat_db.save_message(session(i), "user", text(rng, 120)), args.repeats)
+        measure("save_message report", lambda i: chat_db.save_message(session(i), "assistant", reports[i % 16] + str(i)),
+                args.repeats)
+        measure("get_chat_history", lambda i: chat_db.get_chat_history(session(i)), args.repeats)
+        measure("get_chat_history_page", lambda i: chat_db.get_chat_history_page(session(i), limit=10), args.repeats)
+        measure("get_messages_since", lambda i: chat_db.get_messages_since(session(i), after_id=0), args.repeats)
+        measure("get_all_sessions", lambda i: chat_db.get_all_sessions(), args.repeats)
+        measure("get_sessions_page", lambda i: chat_db.get_sessions_page(limit=20), args.repeats)
+        measure("search_messages", lambda i: chat_db.search_messages(VOCABULARY[i % len(VOCABULARY)]), args.repeats)
+        chat_db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
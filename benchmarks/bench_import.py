@@ -0,0 +1,60 @@
+"""Time cold imports of the app's modules, each in a fresh interpreter.
+
+    python benchmarks/bench_import.py --repeats 5
+
+Reports the median import time and the interpreter's max RSS after importing, and whether the
+import pulled in the agents SDK, which should only load once an agent actually runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["chat_db", "research_jobs", "research_manager", "agent_registry"]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+{extra}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "agents_sdk": "agents" in sys.modules,
+}}))
+"""
+
+
+def probe(module: str, extra: str = "") -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, extra=extra)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(label: str, module: str, repeats: int, extra: str = ""):
+    samples = [probe(module, extra) for _ in range(repeats)]
+    seconds = statistics.median(sample["seconds"] for sample in samples)
+    rss = statistics.median(sample["rss_kib"] for sample in samples) / 1024
+    sdk = "loads agents SDK" if samples[-1]["agents_sdk"] else "no agents SDK"
+    print(f"{label:<36} {seconds * 1000:8.0f} ms  {rss:6.1f} MiB  {sdk}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in MODULES:
+        measure(f"import {module}", module, args.repeats)
+    measure("first agent built (planner)", "agent_registry", args.repeats,
+            extra="agent_registry.get_agent('planner')")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Drive ResearchManager end to end against the stub Runner and report latency, throughput and memory.
+
+    python benchmarks/bench_pipeline.py --runs 40 --concurrency 8 --time-scale 0.01
+    python benchmarks/bench_pipeline.py --pipelined --stream --search-errors 0.2
+    MAX_SEARCHES=50 python benchmarks/bench_pipeline.py --searches 40 --fan-out 8
+
+Latencies are measured on the scaled clock: with --time-scale 0.01 a 6 s search sleeps 60 ms,
+so the fixed costs (SQLite, scheduling, JSON) weigh 100x more than in production.
+The search scheduler is configured as in production, through its environment variables.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ["OPENAI_AGENTS_DISABLE_TRACING"] = "1"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_db
+import research_manager
+from email_render import EMAIL_RENDER_MODE
+from research_manager import ResearchManager
+from search_cache import SearchCache
+from stub_runner import DEFAULT_PROFILES, AgentProfile, StubRunner, install
+
+AGENTS = {
+    "planner": "PlannerAgent", "search": "Search agent", "writer": "WriterAgent",
+    "section": "SectionWriterAgent",
+}
+# Report emails are rendered from a template; only the "llm" render mode asks the email agent
+if EMAIL_RENDER_MODE == "llm":
+    AGENTS["email"] = "Email agent"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def one_run(manager_args: dict, cache: SearchCache, query: str, email: bool) -> float:
+    manager = ResearchManager(search_cache=cache, **manager_args)
+    start = time.perf_counter()
+    async for _ in manager.run(query, "bench@example.com" if email else None):
+        pass
+    return time.perf_counter() - start
+
+
+async def drive(args, cache: SearchCache):
+    manager_args = {
+        "stream_report": args.stream, "pipelined": args.pipelined, "search_deadline": args.search_deadline,
+        "fan_out": args.fan_out, "synthesis_depth": args.synthesis_depth,
+    }
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async def bounded(i: int):
+        nonlocal failures
+        # Distinct subjects miss the search cache unless --repeat-queries asks for hits
+        subject = "subject0" if args.repeat_queries else f"subject{i}"
+        async with semaphore:
+            try:
+                latencies.append(await one_run(manager_args, cache, subject, args.email))
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(bounded(i) for i in range(args.runs)))
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--search-deadline", type=float, default=None)
+    parser.add_argument("--searches", type=int, help="Searches per run instead of the query-sized budget")
+    parser.add_argument("--fan-out", type=int, default=research_manager.synthesis.SYNTHESIS_FAN_OUT)
+    parser.add_argument("--synthesis-depth", type=int, default=research_manager.synthesis.SYNTHESIS_DEPTH)
+    parser.add_argument("--email", action="store_true", help="Also render and queue the report email for every run")
+    parser.add_argument("--repeat-queries", action="store_true", help="Research the same question every run")
+    for flag, name in AGENTS.items():
+        profile = DEFAULT_PROFILES[name]
+        parser.add_argument(f"--{flag}-latency", type=float, default=profile.median_ms, help="median milliseconds")
+        parser.add_argument(f"--{flag}-errors", type=float, default=profile.error_rate, help="failure rate")
+        parser.add_argument(f"--{flag}-output", type=int, default=profile.output_chars,
+                            help="planned searches" if flag == "planner" else "output characters")
+    args = parser.parse_args()
+
+    profiles = {
+        name: AgentProfile(
+            median_ms=getattr(args, f"{flag}_latency"),
+            sigma=DEFAULT_PROFILES[name].sigma,
+            error_rate=getattr(args, f"{flag}_errors"),
+            output_chars=getattr(args, f"{flag}_output"),
+        )
+        for flag, name in AGENTS.items()
+    }
+    if args.searches:
+        research_manager.search_budget = lambda query: args.searches
+    runner = install(StubRunner(profiles, time_scale=args.time_scale, seed=args.seed))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_db.DB_PATH = os.path.join(tmp, "bench.db")
+        chat_db.init_db()
+        cache = SearchCache(db_path=os.path.join(tmp, "cache.db"))
+        tracemalloc.start()
+        start = time.perf_counter()
+        latencies, failures = asyncio.run(drive(args, cache))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with chat_db.get_connection() as conn:
+            emails = conn.execute("SELECT COUNT(*) FROM email_outbox").fetchone()[0]
+        chat_db.close_connections()
+
+    print(f"runs        {len(latencies)} ok, {failures} failed, concurrency {args.concurrency}")
+    if latencies:
+        print(f"latency     p50 {percentile(latencies, 50):.3f} s   p95 {percentile(latencies, 95):.3f} s   "
+              f"p99 {percentile(latencies, 99):.3f} s")
+    print(f"throughput  {len(latencies) / elapsed:.2f} runs/s over {elapsed:.2f} s")
+    print(f"memory      peak traced {peak / 2**20:.1f} MiB, max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+    if args.email:
+        print(f"emails      {emails} queued ({EMAIL_RENDER_MODE} render mode)")
+    print("agent calls " + ", ".join(f"{name} {runner.calls[name]} ({runner.failures[name]} failed)" for name in AGENTS.values()))
+
+
+if __name__ == "__main__":
+    main()
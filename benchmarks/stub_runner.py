@@ -0,0 +1,132 @@
+"""Deterministic stand-in for the agents SDK Runner, for benchmarking without network or API keys.
+
+Each agent gets an AgentProfile: a lognormal latency around `median_ms` plus a per-input-size
+cost, a failure rate and the size of what it returns. `install()` swaps it in for agents.Runner
+so ResearchManager runs unchanged.
+"""
+import asyncio
+import math
+import random
+import re
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+from openai.types.responses import ResponseTextDeltaEvent
+
+from planner_agent import WebSearchItem, WebSearchPlan
+from writer_agent import ReportData
+
+# The stub planner crosses facets with regions; every pair of planned queries differs in
+# a topic word, so search_dedup keeps them apart
+FACETS = [
+    "history", "market size", "regulation", "key players", "open problems",
+    "benchmarks", "costs", "adoption", "risks", "forecast",
+]
+REGIONS = ["worldwide", "europe", "asia", "americas", "africa"]
+
+
+@dataclass
+class AgentProfile:
+    median_ms: float
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    output_chars: int = 1000
+    ms_per_1k_input_chars: float = 0.0
+
+
+DEFAULT_PROFILES = {
+    "PlannerAgent": AgentProfile(median_ms=2000, sigma=0.3, output_chars=len(FACETS) * len(REGIONS)),
+    "Search agent": AgentProfile(median_ms=6000, sigma=0.6, error_rate=0.05, output_chars=1500),
+    "WriterAgent": AgentProfile(median_ms=25000, sigma=0.3, output_chars=8000, ms_per_1k_input_chars=300),
+    "SectionWriterAgent": AgentProfile(median_ms=12000, sigma=0.3, output_chars=3000, ms_per_1k_input_chars=300),
+    # Only called with EMAIL_RENDER_MODE=llm; report emails are otherwise rendered from a template
+    "Email agent": AgentProfile(median_ms=3000, sigma=0.3),
+    "ClarifyAgent": AgentProfile(median_ms=3000, sigma=0.3, output_chars=400),
+    "FollowupAgent": AgentProfile(median_ms=2500, sigma=0.3, output_chars=800, ms_per_1k_input_chars=100),
+}
+
+
+class StubFailure(RuntimeError):
+    pass
+
+
+class StubRunner:
+    def __init__(self, profiles: dict = None, time_scale: float = 1.0, seed: int = 0):
+        """time_scale multiplies every latency, so realistic profiles can be replayed quickly"""
+        self.profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.calls = {name: 0 for name in self.profiles}
+        self.failures = {name: 0 for name in self.profiles}
+
+    async def _respond(self, agent, input_text: str):
+        profile = self.profiles[agent.name]
+        self.calls[agent.name] += 1
+        latency = self.random.lognormvariate(math.log(profile.median_ms), profile.sigma) / 1000
+        latency += len(input_text) / 1000 * profile.ms_per_1k_input_chars / 1000
+        await asyncio.sleep(latency * self.time_scale)
+        if self.random.random() < profile.error_rate:
+            self.failures[agent.name] += 1
+            raise StubFailure(f"stub {agent.name} failure")
+        output = self._output(agent.name, profile, input_text)
+        text = output.model_dump_json() if hasattr(output, "model_dump_json") else str(output)
+        usage = SimpleNamespace(input_tokens=len(input_text) // 4, output_tokens=len(text) // 4, requests=1)
+        return SimpleNamespace(
+            final_output=output,
+            final_output_as=lambda cls: output,
+            context_wrapper=SimpleNamespace(usage=usage),
+        )
+
+    def _output(self, name: str, profile: AgentProfile, input_text: str):
+        if name == "PlannerAgent":
+            subject = input_text.rsplit("Query:", 1)[-1].strip()
+            match = re.search(r"Plan (\d+) searches", input_text)
+            count = min(profile.output_chars, int(match.group(1)) if match else profile.output_chars)
+            return WebSearchPlan(searches=[
+                WebSearchItem(
+                    query=f"{FACETS[k % len(FACETS)]} {REGIONS[k // len(FACETS) % len(REGIONS)]} {subject}",
+                    reason=f"Covers the {FACETS[k % len(FACETS)]}",
+                )
+                for k in range(count)
+            ])
+        if name == "WriterAgent":
+            return ReportData(
+                short_summary="Stub summary.",
+                markdown_report="# Report\n\n" + "lorem ipsum " * (profile.output_chars // 12),
+                follow_up_questions=["What next?"],
+            )
+        return "result " * (profile.output_chars // 7)
+
+    async def run(self, agent, input, **kwargs):
+        return await self._respond(agent, input)
+
+    def run_streamed(self, agent, input, **kwargs):
+        return _StubStream(self, agent, input)
+
+
+class _StubStream:
+    """Mimics RunResultStreaming: raw text deltas of the JSON output, then final_output_as"""
+
+    CHUNK_CHARS = 40
+
+    def __init__(self, runner: StubRunner, agent, input_text: str):
+        self.runner, self.agent, self.input_text = runner, agent, input_text
+        self.result = None
+
+    async def stream_events(self):
+        self.result = await self.runner._respond(self.agent, self.input_text)
+        self.context_wrapper = self.result.context_wrapper
+        text = self.result.final_output.model_dump_json()
+        for i in range(0, len(text), self.CHUNK_CHARS):
+            delta = ResponseTextDeltaEvent.model_construct(type="response.output_text.delta", delta=text[i:i + self.CHUNK_CHARS])
+            yield SimpleNamespace(type="raw_response_event", data=delta)
+
+    def final_output_as(self, cls):
+        return self.result.final_output
+
+
+def install(runner: StubRunner):
+    """Route ResearchManager's model calls, which model_router makes through agents.Runner, to `runner`"""
+    import agents
+    agents.Runner = runner
+    return runner
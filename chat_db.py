@@ -1,10 +1,106 @@
+import hashlib
+import re
 import sqlite3
+import sys
+import threading
 import uuid
+import zlib
 from datetime import datetime
 from typing import List, Tuple, Optional
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 DB_PATH = "chat_history.db"
 
+# Messages at least this many bytes long are stored once, compressed, in content_store
+# and referenced from chat_messages.content_hash; shorter ones stay inline.
+COMPRESS_THRESHOLD = 1024
+
+# Connections are opened once, in WAL mode, and reused. A thread holds its connection for as long
+# as it runs, since a sqlite3 connection must not be used by two threads at once. Streamlit starts
+# a new script thread on every rerun, so when a thread exits its connections go back to a shared
+# idle pool, of at most POOL_SIZE per database, for the next thread to pick up.
+POOL_SIZE = 8
+_pool_lock = threading.Lock()
+_idle: dict = {}
+_local = threading.local()
+
+class _Lease:
+    """A thread's connections, by database; returned to the pool when the thread's local storage is dropped"""
+
+    def __init__(self):
+        self.connections = {}
+
+    def __del__(self):
+        for path, conn in self.connections.items():
+            _release(path, conn)
+
+def _acquire(path: str) -> sqlite3.Connection:
+    with _pool_lock:
+        idle = _idle.get(path)
+        if idle:
+            return idle.pop()
+    conn = sqlite3.connect(path, timeout=30, cached_statements=256, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+def _release(path: str, conn: sqlite3.Connection):
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        with _pool_lock:
+            idle = _idle.setdefault(path, [])
+            if len(idle) < POOL_SIZE:
+                idle.append(conn)
+                return
+        conn.close()
+    except Exception:
+        # The interpreter may be shutting down, or the connection already closed
+        pass
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's connection to DB_PATH, taking one from the pool on first use.
+
+    Use it as a context manager (`with get_connection() as conn:`) to get a transaction
+    that commits on success and rolls back on error; the connection itself stays open.
+    """
+    lease = getattr(_local, "lease", None)
+    if lease is None:
+        lease = _local.lease = _Lease()
+    conn = lease.connections.get(DB_PATH)
+    if conn is None:
+        conn = lease.connections[DB_PATH] = _acquire(DB_PATH)
+    return conn
+
+# Session index cache, keyed by the sessions_version row that triggers on chat_sessions and
+# chat_messages bump. Writes to other tables (job events, heartbeats, metrics) leave it valid.
+_sessions_lock = threading.Lock()
+_session_index = {"version": None, "pages": {}}
+
+def sessions_version() -> Tuple[str, int]:
+    """Changes whenever the session list may have changed, in this process or another"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT version FROM sessions_version WHERE id = 1").fetchone()
+    return DB_PATH, row[0] if row else 0
+
+def close_connections():
+    """Close this thread's connections and every idle one, e.g. before deleting the database files"""
+    lease = getattr(_local, "lease", None)
+    if lease is not None:
+        for conn in lease.connections.values():
+            conn.close()
+        lease.connections = {}
+    with _pool_lock:
+        idle = [conn for connections in _idle.values() for conn in connections]
+        _idle.clear()
+    for conn in idle:
+        conn.close()
+
 def migrate_database(conn):
     """Add new columns to existing database if they don't exist"""
     cursor = conn.cursor()
@@ -20,6 +116,9 @@ def migrate_database(conn):
     if 'last_message_at' not in columns:
         conn.execute("ALTER TABLE chat_sessions ADD COLUMN last_message_at TIMESTAMP")
         print("Added last_message_at column")
+
+    cursor.execute("PRAGMA table_info(chat_messages)")
+    message_columns = [column[1] for column in cursor.fetchall()]
     
     # Update existing sessions with default values
     conn.execute("""
@@ -29,8 +128,122 @@ def migrate_database(conn):
         WHERE session_name IS NULL OR last_message_at IS NULL
     """)
 
+    if 'content_hash' not in message_columns:
+        conn.execute("ALTER TABLE chat_messages ADD COLUMN content_hash TEXT")
+        print("Added content_hash column")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS content_store (
+            hash TEXT PRIMARY KEY,
+            codec TEXT,
+            body BLOB,
+            size INTEGER
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_content_hash ON chat_messages(content_hash) "
+        "WHERE content_hash IS NOT NULL"
+    )
+
+    # Indexes for history and sidebar queries. The messages index covers the keyset
+    # columns; the sessions index matches the sidebar's sort expression exactly so
+    # SQLite can walk it instead of sorting the whole table.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_ts ON chat_messages(session_id, timestamp, id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_activity "
+        "ON chat_sessions(COALESCE(last_message_at, created_at) DESC, session_id DESC)"
+    )
+
+    # Full-text index over message text. Rows share their rowid with chat_messages.id.
+    # The table is contentless: it holds only the index, while the text itself stays
+    # compressed in content_store. Inserts happen in _insert_message and deletes in
+    # _unindex_messages, which must pass the original text back to FTS5.
+    fts = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'chat_messages_fts'"
+    ).fetchone()
+    if fts and "content=''" not in fts[0]:
+        # Earlier versions kept a full uncompressed copy of every message in the index
+        conn.execute("DROP TRIGGER IF EXISTS chat_messages_fts_delete")
+        conn.execute("DROP TABLE chat_messages_fts")
+        fts = None
+    if not fts:
+        conn.execute(
+            "CREATE VIRTUAL TABLE chat_messages_fts USING fts5(content, content='', tokenize = 'porter unicode61')"
+        )
+        cursor = conn.execute(f"SELECT m.id, m.content, c.codec, c.body FROM {_MESSAGE_FROM}")
+        conn.executemany(
+            "INSERT INTO chat_messages_fts (rowid, content) VALUES (?, ?)",
+            ((message_id, _message_content(content, codec, body)) for message_id, content, codec, body in cursor)
+        )
+        print("Built chat_messages_fts search index")
+    # Version of the session list for get_session_index's cache
+    conn.execute("CREATE TABLE IF NOT EXISTS sessions_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER)")
+    conn.execute("INSERT OR IGNORE INTO sessions_version (id, version) VALUES (1, 0)")
+    for table in ("chat_sessions", "chat_messages"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE sessions_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+def _decompress(codec: str, body: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This message was compressed with zstd; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return zlib.decompress(body)
+
+def _store_content(conn, content: str) -> Tuple[Optional[str], Optional[str]]:
+    """Returns the (content, content_hash) pair to save in chat_messages.
+
+    Large bodies go into content_store once per distinct text, so re-running the same
+    research does not store the report again.
+    """
+    data = content.encode("utf-8")
+    if len(data) < COMPRESS_THRESHOLD:
+        return content, None
+    content_hash = hashlib.sha256(data).hexdigest()
+    # The lookup only saves compressing a body that is already stored. The worker and the UI
+    # save concurrently, so another connection may store the same body in between: OR IGNORE
+    # keeps whichever copy landed first.
+    if conn.execute("SELECT 1 FROM content_store WHERE hash = ?", (content_hash,)).fetchone() is None:
+        codec, body = _compress(data)
+        conn.execute(
+            "INSERT OR IGNORE INTO content_store (hash, codec, body, size) VALUES (?, ?, ?, ?)",
+            (content_hash, codec, body, len(data))
+        )
+    return None, content_hash
+
+def _message_content(content: Optional[str], codec: Optional[str], body: Optional[bytes]) -> str:
+    if body is None:
+        return content
+    return _decompress(codec, body).decode("utf-8")
+
+# Message reads join the content store so callers always get plain text back.
+_MESSAGE_FROM = "chat_messages m LEFT JOIN content_store c ON c.hash = m.content_hash"
+
+def _delete_orphaned_content(conn, hashes=None):
+    """Remove content_store rows no message references any more (all of them when `hashes` is None)"""
+    if hashes is None:
+        conn.execute("""
+            DELETE FROM content_store
+            WHERE NOT EXISTS (SELECT 1 FROM chat_messages m WHERE m.content_hash = content_store.hash)
+        """)
+        return
+    conn.executemany("""
+        DELETE FROM content_store
+        WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM chat_messages m WHERE m.content_hash = content_store.hash)
+    """, [(h,) for h in hashes])
+
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         # Create tables with original schema first
         conn.execute("""
             CREATE TABLE IF NOT EXISTS chat_sessions (
@@ -57,7 +270,7 @@ def start_session(session_name: str = None) -> str:
     if not session_name:
         session_name = f"Research Session {datetime.now().strftime('%Y-%m-%d %H:%M')}"
     
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         # Try to insert with new columns, fall back to old schema if needed
         try:
             conn.execute(
@@ -72,13 +285,32 @@ def start_session(session_name: str = None) -> str:
             )
     return session_id
 
-def save_message(session_id: str, role: str, content: str):
-    with sqlite3.connect(DB_PATH) as conn:
+def _insert_message(conn, session_id: str, role: str, content: str, timestamp: datetime) -> int:
+    stored, content_hash = _store_content(conn, content)
+    cursor = conn.execute(
+        "INSERT INTO chat_messages (session_id, role, content, content_hash, timestamp) VALUES (?, ?, ?, ?, ?)",
+        (session_id, role, stored, content_hash, timestamp)
+    )
+    conn.execute(
+        "INSERT INTO chat_messages_fts (rowid, content) VALUES (?, ?)", (cursor.lastrowid, content)
+    )
+    return cursor.lastrowid
+
+def _unindex_messages(conn, session_id: str):
+    """Remove a session's messages from the contentless search index"""
+    rows = conn.execute(
+        f"SELECT m.id, m.content, c.codec, c.body FROM {_MESSAGE_FROM} WHERE m.session_id = ?", (session_id,)
+    ).fetchall()
+    conn.executemany(
+        "INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', ?, ?)",
+        [(message_id, _message_content(content, codec, body)) for message_id, content, codec, body in rows]
+    )
+
+def save_message(session_id: str, role: str, content: str) -> int:
+    """Save a message and return its id"""
+    with get_connection() as conn:
         # Save the message
-        conn.execute(
-            "INSERT INTO chat_messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-            (session_id, role, content, datetime.utcnow())
-        )
+        message_id = _insert_message(conn, session_id, role, content, datetime.utcnow())
         # Update last message time for the session (only if column exists)
         try:
             conn.execute(
@@ -88,19 +320,75 @@ def save_message(session_id: str, role: str, content: str):
         except sqlite3.OperationalError:
             # Column doesn't exist yet, skip update
             pass
+    return message_id
+
+def save_messages(session_id: str, messages: List[Tuple[str, str]]):
+    """Save several (role, content) messages in a single transaction"""
+    now = datetime.utcnow()
+    with get_connection() as conn:
+        for role, content in messages:
+            _insert_message(conn, session_id, role, content, now)
+        conn.execute(
+            "UPDATE chat_sessions SET last_message_at = ? WHERE session_id = ?",
+            (now, session_id)
+        )
 
 def get_chat_history(session_id: str) -> List[Tuple[str, str, str]]:
     """Returns list of (role, content, timestamp) tuples"""
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.execute(
-            "SELECT role, content, timestamp FROM chat_messages WHERE session_id = ? ORDER BY timestamp", 
+            f"SELECT m.role, m.content, c.codec, c.body, m.timestamp FROM {_MESSAGE_FROM} "
+            "WHERE m.session_id = ? ORDER BY m.timestamp",
             (session_id,)
         )
-        return cursor.fetchall()
+        return [(role, _message_content(content, codec, body), timestamp)
+                for role, content, codec, body, timestamp in cursor]
+
+def get_chat_history_page(session_id: str, before: Optional[Tuple[str, int]] = None,
+                          limit: int = 50) -> List[Tuple[int, str, str, str]]:
+    """Returns up to `limit` (id, role, content, timestamp) tuples older than the `before`
+    cursor, oldest first. Pass the (timestamp, id) of the first row to get the previous page."""
+    with get_connection() as conn:
+        if before is None:
+            cursor = conn.execute(
+                f"""SELECT m.id, m.role, m.content, c.codec, c.body, m.timestamp FROM {_MESSAGE_FROM}
+                    WHERE m.session_id = ?
+                    ORDER BY m.timestamp DESC, m.id DESC LIMIT ?""",
+                (session_id, limit)
+            )
+        else:
+            cursor = conn.execute(
+                f"""SELECT m.id, m.role, m.content, c.codec, c.body, m.timestamp FROM {_MESSAGE_FROM}
+                    WHERE m.session_id = ? AND (m.timestamp, m.id) < (?, ?)
+                    ORDER BY m.timestamp DESC, m.id DESC LIMIT ?""",
+                (session_id, before[0], before[1], limit)
+            )
+        return [(message_id, role, _message_content(content, codec, body), timestamp)
+                for message_id, role, content, codec, body, timestamp in cursor][::-1]
+
+def get_messages_since(session_id: str, after_id: int = 0) -> List[Tuple[int, str, str, str]]:
+    """Returns (id, role, content, timestamp) tuples for messages saved after message `after_id`"""
+    with get_connection() as conn:
+        cursor = conn.execute(
+            f"""SELECT m.id, m.role, m.content, c.codec, c.body, m.timestamp FROM {_MESSAGE_FROM}
+                WHERE m.session_id = ? AND m.id > ?
+                ORDER BY m.id""",
+            (session_id, after_id)
+        )
+        return [(message_id, role, _message_content(content, codec, body), timestamp)
+                for message_id, role, content, codec, body, timestamp in cursor]
+
+def get_message(message_id: int) -> Optional[str]:
+    """Returns the content of a single message"""
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT m.content, c.codec, c.body FROM {_MESSAGE_FROM} WHERE m.id = ?", (message_id,)
+        ).fetchone()
+        return _message_content(*row) if row else None
 
 def get_all_sessions() -> List[Tuple[str, str, str, str]]:
     """Returns list of (session_id, session_name, created_at, last_message_at) tuples"""
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.execute(
             """SELECT session_id, 
                       COALESCE(session_name, 'Session ' || substr(session_id, 1, 8)) as session_name,
@@ -111,20 +399,166 @@ def get_all_sessions() -> List[Tuple[str, str, str, str]]:
         )
         return cursor.fetchall()
 
+def get_sessions_page(after: Optional[Tuple[str, str]] = None,
+                      limit: int = 20) -> List[Tuple[str, str, str, str]]:
+    """Returns up to `limit` (session_id, session_name, created_at, last_message_at) tuples, most
+    recent first. Pass the (last_message_at, session_id) of the last row to get the next page."""
+    with get_connection() as conn:
+        if after is None:
+            where, params = "", (limit,)
+        else:
+            where, params = "WHERE (COALESCE(last_message_at, created_at), session_id) < (?, ?)", (*after, limit)
+        cursor = conn.execute(
+            f"""SELECT session_id,
+                       COALESCE(session_name, 'Session ' || substr(session_id, 1, 8)) as session_name,
+                       created_at,
+                       COALESCE(last_message_at, created_at) as last_message_at
+                FROM chat_sessions
+                {where}
+                ORDER BY COALESCE(last_message_at, created_at) DESC, session_id DESC
+                LIMIT ?""",
+            params
+        )
+        return cursor.fetchall()
+
+def _display_time(timestamp: str) -> str:
+    try:
+        return f"Last activity: {datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')}"
+    except ValueError:
+        return f"Created: {timestamp}"
+
+def get_session_index(after: Optional[Tuple[str, str]] = None,
+                      limit: int = 20) -> List[Tuple[str, str, str, str]]:
+    """get_sessions_page as (session_id, session_name, last_message_at, display_time) tuples,
+    served from memory until any session changes"""
+    version = sessions_version()
+    with _sessions_lock:
+        if _session_index["version"] != version:
+            _session_index["version"], _session_index["pages"] = version, {}
+        page = _session_index["pages"].get((after, limit))
+    if page is None:
+        page = [
+            (session_id, session_name, last_message_at, _display_time(last_message_at))
+            for session_id, session_name, created_at, last_message_at in get_sessions_page(after, limit)
+        ]
+        with _sessions_lock:
+            if _session_index["version"] == version:
+                _session_index["pages"][(after, limit)] = page
+    return page
+
 def update_session_name(session_id: str, new_name: str):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute(
             "UPDATE chat_sessions SET session_name = ? WHERE session_id = ?",
             (new_name, session_id)
         )
 
 def delete_session(session_id: str):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
+        hashes = [row[0] for row in conn.execute(
+            "SELECT DISTINCT content_hash FROM chat_messages WHERE session_id = ? AND content_hash IS NOT NULL",
+            (session_id,)
+        )]
+        _unindex_messages(conn, session_id)
         conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
         conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        _delete_orphaned_content(conn, hashes)
 
 def get_session_name(session_id: str) -> Optional[str]:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.execute("SELECT session_name FROM chat_sessions WHERE session_id = ?", (session_id,))
         result = cursor.fetchone()
-        return result[0] if result else None
\ No newline at end of file
+        return result[0] if result else None
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+    Words are quoted so user input can never be parsed as FTS syntax."""
+    words = [word.replace('"', '""') for word in text.split()]
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def _snippet(text: str, words: List[str], size: int = 16) -> str:
+    """About `size` words of `text` around the first match, with matching words in **.
+    The index keeps no text, so FTS5's snippet() is not available."""
+    keys = [re.sub(r"\W+", "", word.lower()) for word in words]
+    keys = [key for key in keys if key]
+
+    def matches(token: str) -> bool:
+        token = re.sub(r"\W+", "", token.lower())
+        return bool(token) and any(token.startswith(key) for key in keys)
+
+    tokens = text.split()
+    first = next((i for i, token in enumerate(tokens) if matches(token)), 0)
+    start = max(0, first - size // 4)
+    window = [f"**{token}**" if matches(token) else token for token in tokens[start:start + size]]
+    return ("…" if start > 0 else "") + " ".join(window) + ("…" if start + size < len(tokens) else "")
+
+def search_messages(text: str, limit: int = 20) -> List[Tuple[str, str, int, str, str]]:
+    """Full-text search over all messages, best match first.
+
+    Returns (session_id, session_name, message_id, role, snippet) tuples; matched terms
+    in the snippet are wrapped in ** for markdown bold.
+    """
+    match = _fts_query(text)
+    if not match:
+        return []
+    with get_connection() as conn:
+        cursor = conn.execute(
+            """SELECT m.session_id,
+                      COALESCE(s.session_name, 'Session ' || substr(m.session_id, 1, 8)),
+                      m.id, m.role, m.content, c.codec, c.body
+               FROM chat_messages_fts f
+               JOIN chat_messages m ON m.id = f.rowid
+               LEFT JOIN content_store c ON c.hash = m.content_hash
+               LEFT JOIN chat_sessions s ON s.session_id = m.session_id
+               WHERE chat_messages_fts MATCH ?
+               ORDER BY bm25(chat_messages_fts)
+               LIMIT ?""",
+            (match, limit)
+        )
+        words = text.split()
+        return [(session_id, session_name, message_id, role, _snippet(_message_content(content, codec, body), words))
+                for session_id, session_name, message_id, role, content, codec, body in cursor]
+
+def compact_messages(batch_size: int = 500) -> int:
+    """One-shot migration: move large inline messages into the compressed content store.
+    Returns the number of messages moved."""
+    moved = 0
+    while True:
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT id, content FROM chat_messages "
+                "WHERE content_hash IS NULL AND length(CAST(content AS BLOB)) >= ? LIMIT ?",
+                (COMPRESS_THRESHOLD, batch_size)
+            ).fetchall()
+            for message_id, content in rows:
+                _, content_hash = _store_content(conn, content)
+                conn.execute(
+                    "UPDATE chat_messages SET content = NULL, content_hash = ? WHERE id = ?",
+                    (content_hash, message_id)
+                )
+        moved += len(rows)
+        if len(rows) < batch_size:
+            return moved
+
+def vacuum():
+    """Drop unreferenced content and rebuild the database file to reclaim free pages"""
+    conn = get_connection()
+    with conn:
+        _delete_orphaned_content(conn)
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command not in ("compact", "vacuum"):
+        print("Usage: python chat_db.py [compact|vacuum]")
+        sys.exit(1)
+    init_db()
+    if command == "compact":
+        print(f"Moved {compact_messages()} messages into the content store")
+    vacuum()
+    print("Vacuumed database")
@@ -1,13 +1,23 @@
-from agents import Agent
-
 INSTRUCTIONS = (
     "You are a clarification agent. You will be given a research query, your job is to generate a list of questions that user has to answer to clarify the query."
     "The questions should narrow down the scope of the research to a more specific topic, by asking questions that explore the intention of the user that he or she forgot to include in the query."
 )
 
-clarify_agent = Agent(
-    name="ClarifyAgent",
-    instructions=INSTRUCTIONS,
-    model="gpt-4o-mini",
-    output_type=str,
-)
\ No newline at end of file
+
+def build_agent():
+    from agents import Agent
+
+    return Agent(
+        name="ClarifyAgent",
+        instructions=INSTRUCTIONS,
+        model="gpt-4o-mini",
+        output_type=str,
+    )
+
+
+def __getattr__(name):
+    # The agent used to be built at import; it is now built on first use
+    if name == "clarify_agent":
+        from agent_registry import get_agent
+        return get_agent("clarify")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
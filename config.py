@@ -0,0 +1,19 @@
+"""Loads .env into the environment once per process.
+
+Modules that read settings from os.environ at import time import this module first, so
+values from .env apply no matter which module a process happens to import first.
+"""
+from dotenv import load_dotenv
+
+_loaded = False
+
+
+def load_config():
+    """Load .env, overriding variables already set in the shell; later calls do nothing"""
+    global _loaded
+    if not _loaded:
+        load_dotenv(override=True)
+        _loaded = True
+
+
+load_config()
@@ -0,0 +1,14 @@
+"""Shared pytest setup. Living at the repository root, this file also puts the root on sys.path,
+so the tests import the app's modules the way the app does."""
+import pytest
+
+import chat_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh chat database in a temporary directory, closed again after the test"""
+    monkeypatch.setattr(chat_db, "DB_PATH", str(tmp_path / "chat_history.db"))
+    chat_db.init_db()
+    yield chat_db.DB_PATH
+    chat_db.close_connections()
@@ -1,23 +1,34 @@
 import streamlit as st
 import asyncio
 import nest_asyncio
-from dotenv import load_dotenv
+import config  # noqa: F401
 from research_manager import ResearchManager
+from research_jobs import (
+    init_jobs, submit_job, get_job, get_active_job, get_events, cancel_job, retry_job, ensure_worker,
+    get_message_run_id, strip_progress
+)
 from chat_db import (
-    init_db, start_session, save_message, get_chat_history, 
-    get_all_sessions, update_session_name, delete_session, get_session_name
+    init_db, start_session, save_message, get_chat_history_page, get_messages_since,
+    get_session_index, update_session_name, delete_session, get_session_name, search_messages,
+    get_message
 )
-from datetime import datetime
+from query_index import QueryIndex
+from research_metrics import metrics_version, stage_summary
+from research_prefetch import start_prefetch
+import research_checkpoints as checkpoints
+from followup import answer_followup
+from email_outbox import init_outbox, get_email, retry_email
 import os
 
 # Setup
 nest_asyncio.apply()
-load_dotenv(override=True)
 st.set_page_config(page_title="Deep Research", layout="wide")
 # os.environ["OPENAI_API_KEY"] = st.secrets['OPENAI_API_KEY']
 # os.environ["SENDGRID_API_KEY"] = st.secrets['SENDGRID_API_KEY']
 # Init DB
 init_db()
+init_jobs()
+init_outbox()
 
 # Initialize session state
 if "current_session_id" not in st.session_state:
@@ -36,8 +47,190 @@ if "sending_email" not in st.session_state:
     st.session_state.sending_email = False
 if "email_sent" not in st.session_state:
     st.session_state.email_sent = False
+if "sent_email_ids" not in st.session_state:
+    st.session_state.sent_email_ids = []
+if "skip_similar" not in st.session_state:
+    st.session_state.skip_similar = False
+if "research_job_id" not in st.session_state:
+    st.session_state.research_job_id = None
+if "failed_job_id" not in st.session_state:
+    st.session_state.failed_job_id = None
+if "prefetch" not in st.session_state:
+    st.session_state.prefetch = None
+if "session_pages" not in st.session_state:
+    st.session_state.session_pages = 1
+if "chat_cache" not in st.session_state:
+    st.session_state.chat_cache = {}
+if "message_previews" not in st.session_state:
+    st.session_state.message_previews = {}
+if "job_log" not in st.session_state:
+    st.session_state.job_log = {}
+if "cache_stats" not in st.session_state:
+    st.session_state.cache_stats = {}
+
+# Messages shown when a session is opened; older ones load on request
+HISTORY_PAGE_SIZE = 20
+SESSION_PAGE_SIZE = 20
+# How long step 2 waits for the clarifying questions before falling back to a generic prompt
+CLARIFY_WAIT_SECONDS = 20
+# Assistant messages longer than this, other than the latest, are collapsed to a preview
+REPORT_PREVIEW_CHARS = 600
+# How often a running research job's progress is refreshed
+JOB_POLL_SECONDS = 0.5
 
 manager = ResearchManager()
+query_index = QueryIndex()
+
+def load_chat_messages(session_id: str) -> list:
+    """The session's (id, role, content, timestamp) messages, kept in session_state between reruns.
+
+    Opening a session loads its latest page; later reruns only fetch messages saved since.
+    """
+    cache = st.session_state.chat_cache
+    if cache.get("session_id") != session_id:
+        page = get_chat_history_page(session_id, limit=HISTORY_PAGE_SIZE)
+        cache = {
+            "session_id": session_id,
+            "messages": page,
+            "last_id": max((message[0] for message in page), default=0),
+            "has_more": len(page) == HISTORY_PAGE_SIZE,
+        }
+        st.session_state.chat_cache = cache
+    else:
+        new_messages = get_messages_since(session_id, cache["last_id"])
+        if new_messages:
+            cache["messages"] = cache["messages"] + new_messages
+            cache["last_id"] = new_messages[-1][0]
+    return cache["messages"]
+
+def load_earlier_messages(session_id: str):
+    cache = st.session_state.chat_cache
+    oldest_id, _, _, oldest_ts = cache["messages"][0]
+    page = get_chat_history_page(session_id, before=(oldest_ts, oldest_id), limit=HISTORY_PAGE_SIZE)
+    cache["messages"] = page + cache["messages"]
+    cache["has_more"] = len(page) == HISTORY_PAGE_SIZE
+
+def message_preview(message_id: int, content: str) -> tuple:
+    """(title, first paragraph) of a report, worked out once per message"""
+    previews = st.session_state.message_previews
+    if message_id not in previews:
+        lines = [line.strip() for line in content.splitlines() if line.strip()]
+        headings = [line.lstrip("#").strip() for line in lines if line.startswith("#")]
+        paragraphs = [line for line in lines if not line.startswith(("#", "|", "---"))]
+        title = headings[0] if headings else "Research report"
+        preview = paragraphs[0] if paragraphs else ""
+        previews[message_id] = (title, preview[:300] + ("…" if len(preview) > 300 else ""))
+    return previews[message_id]
+
+def render_chat_history(session_id: str) -> list:
+    """Show the conversation, older reports collapsed until asked for; returns the loaded messages"""
+    messages = load_chat_messages(session_id)
+    if st.session_state.chat_cache["has_more"]:
+        if st.button("⬆️ Show earlier messages"):
+            load_earlier_messages(session_id)
+            st.rerun()
+    latest_assistant = next((message[0] for message in reversed(messages) if message[1] != "user"), None)
+    for message_id, role, content, timestamp in messages:
+        with st.chat_message("user" if role == "user" else "assistant"):
+            if role == "user" or message_id == latest_assistant or len(content) <= REPORT_PREVIEW_CHARS:
+                st.write(content)
+                continue
+            # Only a short preview is sent to the browser unless the full report is toggled open
+            title, preview = message_preview(message_id, content)
+            st.markdown(f"**{title}**")
+            st.caption(preview)
+            if st.toggle("Show full report", key=f"expand_{message_id}"):
+                st.markdown(content)
+    return messages
+
+def search_cache_stats() -> dict:
+    """The search cache's hit counts, looked up again only once another research run has finished"""
+    version = metrics_version()
+    if st.session_state.cache_stats.get("version") != version:
+        st.session_state.cache_stats = {"version": version, **manager.search_cache.stats()}
+    return st.session_state.cache_stats
+
+def restart_prefetch(query: str):
+    """Start clarifying and speculatively researching `query`, dropping any earlier topic's prefetch"""
+    if st.session_state.prefetch:
+        st.session_state.prefetch.cancel()
+    st.session_state.prefetch = start_prefetch(query)
+    return st.session_state.prefetch
+
+def read_job_log(job_id: str) -> tuple:
+    """(progress output, streamed report preview) of a job, reading only events logged since the last call"""
+    log = st.session_state.job_log
+    if log.get("job_id") != job_id:
+        log = {"job_id": job_id, "last_event_id": 0, "output": "", "preview": ""}
+        st.session_state.job_log = log
+    for event_id, kind, content in get_events(job_id, log["last_event_id"]):
+        log["last_event_id"] = event_id
+        if kind == "report_delta":
+            log["preview"] += content
+            continue
+        if kind == "report":
+            # The finished report replaces the streamed preview
+            log["preview"] = ""
+        log["output"] += content + "\n\n"
+    return log["output"], log["preview"]
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id: str):
+    """Re-runs on its own every JOB_POLL_SECONDS; hands back to a full rerun once the job is done"""
+    output, report_preview = read_job_log(job_id)
+    st.markdown(f"⚡ **Research Progress:**\n\n{output}{report_preview}")
+    if get_job(job_id)["status"] not in ("queued", "running"):
+        st.rerun()
+
+def show_job_progress(job_id: str):
+    """Follow a background research job's event log until it finishes, then return to chat mode.
+
+    While the job runs, only the job_progress fragment re-runs, so no script thread waits on the job.
+    """
+    job = get_job(job_id)
+    if job["status"] in ("queued", "running"):
+        if st.button("🛑 Cancel research", key=f"cancel_{job_id}"):
+            cancel_job(job_id)
+        job_progress(job_id)
+        st.stop()
+    finish_job(job)
+
+def finish_job(job: dict):
+    """Stop following a finished job: move to chat mode, or keep a failed job's log on screen"""
+    st.session_state.research_job_id = None
+    if job["status"] != "succeeded":
+        # Failed and cancelled runs are not saved to the chat; leave the log on screen until the user moves on
+        st.session_state.failed_job_id = job["job_id"]
+        show_failed_job(job["job_id"])
+        st.stop()
+    st.session_state.research_step = 4  # Move to chat mode
+    st.rerun()
+
+def retry_failed_job(job_id: str):
+    retry_job(job_id)
+    ensure_worker()
+    st.session_state.failed_job_id = None
+    st.session_state.research_job_id = job_id
+
+def leave_failed_job():
+    st.session_state.failed_job_id = None
+    st.session_state.research_step = 4
+
+def show_failed_job(job_id: str):
+    """The log of a failed or cancelled job, with buttons to retry it or go back to the conversation"""
+    output, _ = read_job_log(job_id)
+    st.markdown(f"⚡ **Research Progress:**\n\n{output}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("🔁 Retry", help="Completed stages are reused", use_container_width=True,
+                  on_click=retry_failed_job, args=(job_id,))
+    with col2:
+        st.button("↩️ Back to conversation", use_container_width=True, on_click=leave_failed_job)
+
+def forget_research_job():
+    """Stop following the current or failed research job, before research on a new query starts"""
+    st.session_state.research_job_id = None
+    st.session_state.failed_job_id = None
 
 # Sidebar for session management
 with st.sidebar:
@@ -48,18 +241,40 @@ with st.sidebar:
         new_session_id = start_session()
         st.session_state.current_session_id = new_session_id
         st.session_state.research_step = 1
+        forget_research_job()
         st.session_state.query = ""
         st.session_state.clarification = ""
         st.rerun()
     
     st.divider()
     
-    # Display all sessions
-    sessions = get_all_sessions()
+    # Full-text search across all sessions
+    search_text = st.text_input("🔎 Search past research", placeholder="e.g. quantum error correction")
+    if search_text:
+        matches = search_messages(search_text)
+        if not matches:
+            st.caption("No matches found.")
+        for session_id, session_name, message_id, role, snippet in matches:
+            if st.button(f"📄 {session_name}", key=f"search_{message_id}", use_container_width=True):
+                st.session_state.current_session_id = session_id
+                st.session_state.research_step = 4  # Go to chat mode
+                st.rerun()
+            st.caption(snippet)
+        st.divider()
+    
+    # Display sessions a page at a time from the cached session index
+    sessions = []
+    cursor = None
+    for _ in range(st.session_state.session_pages):
+        page = get_session_index(after=cursor, limit=SESSION_PAGE_SIZE)
+        sessions.extend(page)
+        if len(page) < SESSION_PAGE_SIZE:
+            break
+        cursor = (page[-1][2], page[-1][0])
     
     if sessions:
         st.subheader("Previous Sessions")
-        for session_id, session_name, created_at, last_message_at in sessions:
+        for session_id, session_name, last_message_at, last_activity in sessions:
             # Create a container for each session
             with st.container():
                 col1, col2 = st.columns([3, 1])
@@ -85,14 +300,40 @@ with st.sidebar:
                             st.session_state.research_step = 1
                         st.rerun()
                 
-                # Show last message time
-                try:
-                    last_msg_time = datetime.fromisoformat(last_message_at.replace('Z', '+00:00'))
-                    st.caption(f"Last activity: {last_msg_time.strftime('%Y-%m-%d %H:%M')}")
-                except:
-                    st.caption(f"Created: {created_at}")
+                st.caption(last_activity)
                 
                 st.divider()
+        
+        if len(sessions) == st.session_state.session_pages * SESSION_PAGE_SIZE:
+            if st.button("Load more sessions", use_container_width=True):
+                st.session_state.session_pages += 1
+                st.rerun()
+
+    # Where recent research runs spend their time and money
+    with st.expander("📈 Research performance"):
+        summary = stage_summary()
+        if not summary:
+            st.caption("No completed research runs yet.")
+        for stage in summary:
+            st.caption(
+                f"**{stage['stage']}**: {stage['avg_seconds']:.1f}s, {stage['avg_tokens']:,.0f} tokens, "
+                f"${stage['avg_cost_usd']:.4f} per run"
+                + (f", {stage['retries']} retries" if stage['retries'] else "")
+            )
+        cache_stats = search_cache_stats()
+        st.caption(f"Search cache hit rate: {cache_stats['hit_rate']:.0%} of {cache_stats['hits'] + cache_stats['misses']} lookups")
+
+    # Show session management options; rendered before the main area, which may stop the script early
+    st.divider()
+    if st.button("🔄 Reset Current Session"):
+        if st.session_state.prefetch:
+            st.session_state.prefetch.cancel()
+            st.session_state.prefetch = None
+        st.session_state.research_step = 1
+        st.session_state.query = ""
+        st.session_state.clarification = ""
+        forget_research_job()
+        st.rerun()
 
 # Main content area
 if st.session_state.current_session_id is None:
@@ -129,6 +370,7 @@ else:
             # Update session name with the query
             session_name = f"Research: {query[:50]}..." if len(query) > 50 else f"Research: {query}"
             update_session_name(st.session_state.current_session_id, session_name)
+            restart_prefetch(query)
             st.session_state.research_step = 2
             st.rerun()
     
@@ -136,17 +378,26 @@ else:
         # Step 2: Clarify
         st.subheader("Step 2: Clarification")
         
-        prompt_html = """
-        <div style="background-color: #f0f2f6; padding: 1rem; border-radius: 0.5rem; margin-bottom: 1rem;">
-            Could you please clarify what you're looking for regarding your topic?
-        </div>
-        """
-        st.markdown(prompt_html, unsafe_allow_html=True)
+        # Questions come from clarify_agent, which runs alongside speculative planning and searching
+        prefetch = st.session_state.prefetch
+        if prefetch is None or prefetch.query != st.session_state.query:
+            prefetch = restart_prefetch(st.session_state.query)
+        if not prefetch.clarified.is_set():
+            with st.spinner("Preparing a few clarifying questions..."):
+                prefetch.clarified.wait(CLARIFY_WAIT_SECONDS)
+        st.info(prefetch.questions or "Could you please clarify what you're looking for regarding your topic?")
+        if prefetch.planned:
+            st.caption(
+                f"🔎 {len(prefetch.completed)} of {len(prefetch.planned)} searches on the topic "
+                f"already done in the background"
+            )
         
         clarification = st.text_input("Your clarification:", value=st.session_state.clarification)
         
         if st.button("Submit Clarification") and clarification:
             st.session_state.clarification = clarification
+            if prefetch.questions:
+                save_message(st.session_state.current_session_id, "assistant", prefetch.questions)
             save_message(st.session_state.current_session_id, "user", clarification)
             st.session_state.research_step = 3
             st.rerun()
@@ -157,60 +408,111 @@ else:
         st.title(f"🔍 {current_session_name}")
         
         # Always show existing chat history first
-        chat_history = get_chat_history(st.session_state.current_session_id)
-        
-        if chat_history:
+        if load_chat_messages(st.session_state.current_session_id):
             st.subheader("Previous Conversation")
-            for role, content, timestamp in chat_history:
-                if role == "user":
-                    with st.chat_message("user"):
-                        st.write(content)
-                else:
-                    with st.chat_message("assistant"):
-                        st.write(content)
-            
+            render_chat_history(st.session_state.current_session_id)
             st.divider()
         
+        # Reattach to a research job that is still running for this session
+        job_id = st.session_state.research_job_id
+        job = get_job(job_id) if job_id else None
+        if not job or job["session_id"] != st.session_state.current_session_id:
+            job_id = None
+        elif job["status"] not in ("queued", "running"):
+            # The job finished since the last rerun
+            with st.chat_message("assistant"):
+                finish_job(job)
+        if job_id is None:
+            active_job = get_active_job(st.session_state.current_session_id)
+            job_id = active_job["job_id"] if active_job else None
+
+        # A failed or cancelled run stays on screen until the user retries it or moves on
+        failed_job_id = st.session_state.failed_job_id
+        if job_id is None and failed_job_id and get_job(failed_job_id)["session_id"] == st.session_state.current_session_id:
+            with st.chat_message("assistant"):
+                show_failed_job(failed_job_id)
+            st.stop()
+        
+        # Offer an earlier report if this question has effectively been answered before
+        similar = None
+        if job_id is None and not st.session_state.skip_similar:
+            similar = query_index.most_similar(st.session_state.query, st.session_state.clarification)
+        if similar:
+            score, match = similar
+            st.info(
+                f"A similar question was researched on {str(match['created_at'])[:10]}: "
+                f"*{match['query']}* (similarity {score:.0%})"
+            )
+            # A report with checkpoints can be brought up to date by re-running only its stale searches
+            refresh_run_id = get_message_run_id(match["message_id"])
+            columns = st.columns(3 if refresh_run_id else 2)
+            col1, col2 = columns[0], columns[-1]
+            if refresh_run_id:
+                with columns[1]:
+                    if st.button("♻️ Refresh stale parts", use_container_width=True):
+                        full_query = f"{st.session_state.query}\n\nUser clarification:\n{st.session_state.clarification}"
+                        st.session_state.research_job_id = submit_job(
+                            st.session_state.current_session_id, full_query,
+                            {"query": st.session_state.query, "clarification": st.session_state.clarification,
+                             "refresh_run_id": refresh_run_id}
+                        )
+                        ensure_worker()
+                        st.rerun()
+            with col1:
+                if st.button("📄 Use previous report", use_container_width=True):
+                    previous = get_message(match["message_id"])
+                    save_message(
+                        st.session_state.current_session_id, "assistant",
+                        f"📄 Reusing the report from an earlier, similar research: *{match['query']}*\n\n{previous}"
+                    )
+                    st.session_state.research_step = 4
+                    st.rerun()
+            with col2:
+                if st.button("🔄 Run fresh research", use_container_width=True):
+                    st.session_state.skip_similar = True
+                    st.rerun()
+            st.stop()
+        
+        if job_id is None:
+            # The research itself runs in the background worker pool
+            full_query = f"{st.session_state.query}\n\nUser clarification:\n{st.session_state.clarification}"
+            # The job plans and searches for itself; only searches the prefetch already finished are reused
+            prefetch, st.session_state.prefetch = st.session_state.prefetch, None
+            prefetched = []
+            if prefetch and prefetch.query == st.session_state.query:
+                prefetched = prefetch.take_completed()
+            elif prefetch:
+                prefetch.cancel()
+            job_id = submit_job(
+                st.session_state.current_session_id, full_query,
+                {"query": st.session_state.query, "clarification": st.session_state.clarification,
+                 "prefetched_searches": prefetched}
+            )
+            ensure_worker()
+            st.session_state.skip_similar = False
+        st.session_state.research_job_id = job_id
+        
         # Show current research processing
         st.subheader("🔍 Current Research in Progress")
         
         with st.chat_message("assistant"):
-            placeholder = st.empty()
-            
-            full_query = f"{st.session_state.query}\n\nUser clarification:\n{st.session_state.clarification}"
-            
-            async def run_research():
-                output = ""
-                async for chunk in manager.run(full_query):
-                    output += chunk + "\n\n"
-                    placeholder.markdown(f"⚡ **Research Progress:**\n\n{output}")
-                
-                # Save the final output
-                save_message(st.session_state.current_session_id, "assistant", output)
-                st.session_state.research_step = 4  # Move to chat mode
-                st.rerun()
-            
-            # Run the research
-            asyncio.run(run_research())
+            show_job_progress(job_id)
     
     elif st.session_state.research_step == 4:
         # Chat mode - show all messages and allow new questions
         st.subheader("Research Conversation")
         
-        # Always display chat history first
-        chat_history = get_chat_history(st.session_state.current_session_id)
-        
         # Create a container for chat history that stays visible
         chat_container = st.container()
         
         with chat_container:
-            for role, content, timestamp in chat_history:
-                if role == "user":
-                    with st.chat_message("user"):
-                        st.write(content)
-                else:
-                    with st.chat_message("assistant"):
-                        st.write(content)
+            chat_history = render_chat_history(st.session_state.current_session_id)
+        
+        # Follow research that is still running for this session, e.g. after a page refresh
+        active_job = get_active_job(st.session_state.current_session_id)
+        if active_job:
+            with st.chat_message("assistant"):
+                show_job_progress(active_job["job_id"])
         
         # Check if we're currently processing a question
         if "processing_question" in st.session_state and st.session_state.processing_question:
@@ -223,21 +525,18 @@ else:
                     question = st.session_state.current_question
                     output = ""
                     
-                    # Check if this looks like a new research request
-                    research_keywords = ["research", "analyze", "study", "investigate", "explore", "find information about"]
-                    
-                    if any(keyword in question.lower() for keyword in research_keywords):
-                        # Full research pipeline
-                        processing_placeholder.markdown("🔍 **Planning searches...**")
-                        
-                        async for chunk in manager.run(question):
-                            output += chunk + "\n\n"
-                            processing_placeholder.markdown(f"⚡ **Processing Research...**\n\n{output}")
-                    else:
-                        # Simple follow-up - you can customize this logic
-                        processing_placeholder.markdown("🤔 **Thinking...**")
-                        await asyncio.sleep(1)  # Simulate processing
-                        output = f"Thank you for your follow-up question: '{question}'\n\nThis appears to be a follow-up question. For comprehensive research on this topic, please use the 'New Research' button or include research keywords in your question."
+                    # Answer from the session's reports and search summaries; new searches only run
+                    # when they do not cover the question. Full research is the "New Research" button.
+                    processing_placeholder.markdown("🤔 **Thinking...**")
+                    try:
+                        async for chunk in answer_followup(
+                            manager, st.session_state.current_session_id, question,
+                            topic=st.session_state.query or current_session_name
+                        ):
+                            output = chunk
+                            processing_placeholder.markdown(chunk)
+                    except Exception as e:
+                        output = f"❌ Could not answer the follow-up question: {e}"
                         processing_placeholder.markdown(output)
                     
                     # Save the response
@@ -293,6 +592,8 @@ else:
             # Start new research process
             st.session_state.query = new_question
             st.session_state.clarification = ""
+            forget_research_job()
+            restart_prefetch(new_question)
             st.session_state.research_step = 2  # Go to clarification step
             st.rerun()
         
@@ -301,7 +602,24 @@ else:
         st.subheader("📧 Email Report")
         
         if st.session_state.email_sent:
-            st.success("✅ Report sent successfully!")
+            # Only the emails queued by the last send, not older ones from this session
+            emails = [email for email in map(get_email, st.session_state.sent_email_ids) if email]
+            if not emails:
+                st.warning("The report was not queued for delivery.")
+            for email in emails:
+                if email["status"] == "sent":
+                    st.success(f"✅ Report sent to {email['recipient']}")
+                elif email["status"] == "failed":
+                    st.error(f"❌ Could not send to {email['recipient']}: {email['last_error']}")
+                    if st.button("Retry", key=f"retry_email_{email['id']}"):
+                        retry_email(email["id"])
+                        ensure_worker()
+                        st.rerun()
+                else:
+                    retry_note = f" (attempt {email['attempts'] + 1})" if email["attempts"] else ""
+                    st.info(f"📤 Report to {email['recipient']} is queued for delivery{retry_note}")
+            if st.button("🔄 Refresh status"):
+                st.rerun()
             if st.button("Send to another email"):
                 st.session_state.email_sent = False
                 st.session_state.sending_email = False
@@ -316,20 +634,35 @@ else:
             
             if send_btn and email_address:
                 # Get the latest assistant message (the report)
-                report_content = ""
-                for role, content, timestamp in reversed(chat_history):
-                    if role == "assistant":
-                        report_content = content
-                        break
+                report_message = next(
+                    ((message_id, content) for message_id, role, content, timestamp in reversed(chat_history)
+                     if role == "assistant"),
+                    None
+                )
                 
-                if report_content:
-                    with st.spinner("📧 Sending report..."):
-                        async def send_report_email():
-                            await manager.send_email_report(report_content, email_address.strip())
-                        asyncio.run(send_report_email())
-                    st.session_state.email_sent = True
-                    st.session_state.sending_email = False
-                    st.rerun()
+                if report_message:
+                    # The run's checkpointed ReportData carries the short summary used as the subject;
+                    # the chat message also holds the run's progress log
+                    message_id, content = report_message
+                    run_id = get_message_run_id(message_id)
+                    report = checkpoints.load_report(run_id) if run_id else None
+                    recipient = email_address.strip()
+                    session_id = st.session_state.current_session_id
+                    if report:
+                        send = manager.send_email(report, recipient, session_id=session_id)
+                    else:
+                        send = manager.send_email_report(strip_progress(content), recipient, session_id=session_id)
+                    # Queue the email before rerunning so its status shows; the worker process delivers it
+                    try:
+                        with st.spinner("📝 Formatting the report for email..."):
+                            st.session_state.sent_email_ids = asyncio.run(send)
+                    except Exception as e:
+                        st.error(f"❌ Could not queue the email: {e}")
+                    else:
+                        ensure_worker()
+                        st.session_state.email_sent = True
+                        st.session_state.sending_email = False
+                        st.rerun()
                 else:
                     st.error("No report found to send.")
             
@@ -341,12 +674,3 @@ else:
                 st.session_state.sending_email = True
                 st.session_state.email_sent = False
                 st.rerun()
-    
-    # Show session management options
-    st.sidebar.divider()
-    if st.sidebar.button("🔄 Reset Current Session"):
-        st.session_state.research_step = 1
-        st.session_state.query = ""
-        st.session_state.clarification = ""
-        st.rerun()
-
@@ -1,51 +1,33 @@
-import smtplib
-import os
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-from agents import Agent, function_tool
 from typing import Dict
 
-load_dotenv(override=True)
+from email_outbox import enqueue_email
 
-@function_tool
-def send_email(subject: str, html_body: str, recipient_email: str) -> Dict[str, str]:
-    """Send out an email with the given subject and HTML body to the specified recipient using Gmail SMTP"""
-    sender_email = os.environ.get('GMAIL_EMAIL')
-    sender_password = os.environ.get('GMAIL_APP_PASSWORD')
-
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
 
-        # Add body to email
-        msg.attach(MIMEText(html_body, 'html'))
+def send_email(subject: str, html_body: str, recipient_email: str) -> Dict[str, str]:
+    """Send out an email with the given subject and HTML body to the specified recipient"""
+    # Delivery happens in the background outbox worker; queueing is all the agent waits for
+    email_id = enqueue_email(recipient_email, subject, html_body)
+    return {"status": "queued", "message": f"Email {email_id} to {recipient_email} queued for delivery"}
 
-        # Connect to Gmail SMTP server
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
+INSTRUCTIONS = """You are able to send a nicely formatted HTML email based on a detailed report.
+You will be provided with a detailed report. You should use your tool to send one email, providing the 
+report converted into clean, well presented HTML with an appropriate subject line."""
 
-        # Send email
-        server.sendmail(sender_email, recipient_email, msg.as_string())
-        server.quit()
 
-        return {"status": "success", "message": f"Email sent to {recipient_email}"}
+def build_agent():
+    from agents import Agent, function_tool
 
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    return Agent(
+        name="Email agent",
+        instructions=INSTRUCTIONS,
+        tools=[function_tool(send_email)],
+        model="gpt-4o-mini",
+    )
 
-INSTRUCTIONS = """You are able to send a nicely formatted HTML email based on a detailed report.
-You will be provided with a detailed report. You should use your tool to send one email, providing the 
-report converted into clean, well presented HTML with an appropriate subject line."""
 
-email_agent = Agent(
-    name="Email agent",
-    instructions=INSTRUCTIONS,
-    tools=[send_email],
-    model="gpt-4o-mini",
-)
\ No newline at end of file
+def __getattr__(name):
+    # The agent used to be built at import; it is now built on first use
+    if name == "email_agent":
+        from agent_registry import get_agent
+        return get_agent("email")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,257 @@
+"""Outbox for report emails.
+
+Emails are queued in the chat database and delivered by `run_outbox`, which the research
+worker process runs alongside its jobs (or run it alone with `python email_outbox.py`).
+Delivery reuses one SMTP connection while mail keeps coming, retries transient failures
+with backoff and records each email's status, so sending never blocks the app.
+
+SMTP_HOST / SMTP_PORT / SMTP_STARTTLS point it at another server, e.g. a local aiosmtpd
+stand-in (`python -m aiosmtpd -n -l localhost:8025` with SMTP_HOST=localhost SMTP_PORT=8025
+SMTP_STARTTLS=0).
+"""
+import asyncio
+import os
+import random
+import smtplib
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import List, Optional
+
+import config  # noqa: F401
+import chat_db
+
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "1").lower() not in ("0", "false", "no")
+SMTP_TIMEOUT_SECONDS = 30
+# An idle connection is closed after this long; servers drop idle clients after a few minutes anyway
+SMTP_IDLE_SECONDS = 60
+MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 5))
+BASE_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 300.0
+POLL_INTERVAL_SECONDS = 1.0
+# An email left 'sending' this long belongs to a worker that died mid-delivery
+STALE_AFTER_SECONDS = 300
+
+# Session the emails queued in the current context belong to, so the app can show their status
+outbox_session: ContextVar[Optional[str]] = ContextVar("outbox_session", default=None)
+# Ids of the emails queued in the current context are appended here, when a caller collects them
+outbox_queued: ContextVar[Optional[list]] = ContextVar("outbox_queued", default=None)
+
+_EMAIL_COLUMNS = ("id", "session_id", "recipient", "subject", "status", "attempts", "last_error",
+                  "created_at", "sent_at")
+
+
+def init_outbox():
+    with chat_db.get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                recipient TEXT,
+                subject TEXT,
+                html_body TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP,
+                claimed_at TIMESTAMP,
+                sent_at TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_status ON email_outbox(status, next_attempt_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_session ON email_outbox(session_id, id)")
+
+
+def enqueue_email(recipient: str, subject: str, html_body: str, session_id: str = None) -> int:
+    """Queue an email for delivery and return its id"""
+    now = datetime.utcnow()
+    with chat_db.get_connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO email_outbox (session_id, recipient, subject, html_body, status, next_attempt_at, created_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (session_id or outbox_session.get(), recipient, subject, html_body, now, now)
+        )
+    queued = outbox_queued.get()
+    if queued is not None:
+        queued.append(cursor.lastrowid)
+    return cursor.lastrowid
+
+
+def get_email(email_id: int) -> Optional[dict]:
+    with chat_db.get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_EMAIL_COLUMNS)} FROM email_outbox WHERE id = ?", (email_id,)
+        ).fetchone()
+    return dict(zip(_EMAIL_COLUMNS, row)) if row else None
+
+
+def get_session_emails(session_id: str, limit: int = 5) -> List[dict]:
+    """The session's most recent emails, newest first"""
+    with chat_db.get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(_EMAIL_COLUMNS)} FROM email_outbox WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+    return [dict(zip(_EMAIL_COLUMNS, row)) for row in rows]
+
+
+def _claim_email() -> Optional[dict]:
+    conn = chat_db.get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id, recipient, subject, html_body, attempts FROM email_outbox "
+            "WHERE status = 'queued' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1",
+            (datetime.utcnow(),)
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE email_outbox SET status = 'sending', claimed_at = ? WHERE id = ?", (datetime.utcnow(), row[0])
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return dict(zip(("id", "recipient", "subject", "html_body", "attempts"), row)) if row else None
+
+
+def _mark_sent(email_id: int):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL "
+            "WHERE id = ?",
+            (datetime.utcnow(), email_id)
+        )
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """5xx replies (unknown recipient, rejected message, bad credentials) will not succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def _mark_failed(email: dict, error: Exception):
+    attempts = email["attempts"] + 1
+    give_up = attempts >= MAX_ATTEMPTS or is_permanent_error(error)
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            ("failed" if give_up else "queued", attempts,
+             datetime.utcnow() + timedelta(seconds=_backoff(attempts)), f"{type(error).__name__}: {error}",
+             email["id"])
+        )
+
+
+def retry_email(email_id: int):
+    """Queue a failed email for another round of attempts"""
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = 'queued', attempts = 0, next_attempt_at = ? "
+            "WHERE id = ? AND status = 'failed'",
+            (datetime.utcnow(), email_id)
+        )
+
+
+def _requeue_stale_emails():
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER_SECONDS)
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = 'queued' WHERE status = 'sending' AND claimed_at < ?", (cutoff,)
+        )
+
+
+class SMTPConnection:
+    """One logged-in SMTP session, opened on first use and reused until idle or broken"""
+
+    def __init__(self, host: str = None, port: int = None, starttls: bool = None,
+                 username: str = None, password: str = None):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.starttls = SMTP_STARTTLS if starttls is None else starttls
+        self.username = username if username is not None else os.environ.get("GMAIL_EMAIL")
+        self.password = password if password is not None else os.environ.get("GMAIL_APP_PASSWORD")
+        self.sender = os.environ.get("EMAIL_SENDER") or self.username or "deep-research@localhost"
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        if self.starttls:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def send(self, recipient: str, subject: str, html_body: str):
+        msg = MIMEMultipart()
+        msg["From"] = self.sender
+        msg["To"] = recipient
+        msg["Subject"] = subject
+        msg.attach(MIMEText(html_body, "html"))
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.sendmail(self.sender, recipient, msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the kept-alive session; reconnect once
+            self._smtp = self._connect()
+            self._smtp.sendmail(self.sender, recipient, msg.as_string())
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            self.close()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except smtplib.SMTPException:
+            self._smtp.close()
+        except OSError:
+            pass
+        self._smtp = None
+
+
+async def run_outbox(connection: SMTPConnection = None):
+    """Deliver queued emails until cancelled; SMTP calls run in a thread so the event loop stays free"""
+    init_outbox()
+    connection = connection or SMTPConnection()
+    try:
+        while True:
+            _requeue_stale_emails()
+            email = _claim_email()
+            if email is None:
+                connection.close_if_idle()
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                continue
+            try:
+                await asyncio.to_thread(connection.send, email["recipient"], email["subject"], email["html_body"])
+            except (smtplib.SMTPException, OSError) as e:
+                # Start from a fresh connection after any failure
+                connection.close()
+                _mark_failed(email, e)
+            else:
+                _mark_sent(email["id"])
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    chat_db.init_db()
+    try:
+        asyncio.run(run_outbox())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,115 @@
+"""Local rendering of reports into HTML emails.
+
+Reports are converted from markdown with a fixed template instead of a round trip through
+email_agent, so the same report always produces the same email. Rendered emails are cached
+in the chat database by a hash of their input. Set EMAIL_RENDER_MODE=llm to have email_agent
+write the HTML and subject instead.
+"""
+import hashlib
+import html
+import os
+import re
+from datetime import datetime
+from string import Template
+from typing import Optional, Tuple
+
+import markdown
+
+import config  # noqa: F401
+import chat_db
+
+EMAIL_RENDER_MODE = os.environ.get("EMAIL_RENDER_MODE", "template")
+SUBJECT_MAX_CHARS = 78
+# Bump when the template or markdown options change so cached emails are re-rendered
+TEMPLATE_VERSION = "1"
+
+_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+  body { font-family: -apple-system, Segoe UI, Helvetica, Arial, sans-serif; color: #1f2328; line-height: 1.55; }
+  .container { max-width: 720px; margin: 0 auto; padding: 24px; }
+  .summary { background: #f4f7fb; border-left: 4px solid #3b82f6; padding: 12px 16px; margin-bottom: 24px; }
+  h1, h2, h3 { color: #0f172a; line-height: 1.25; }
+  table { border-collapse: collapse; margin: 16px 0; }
+  th, td { border: 1px solid #d0d7de; padding: 6px 12px; text-align: left; }
+  code { background: #f6f8fa; padding: 2px 4px; border-radius: 4px; }
+  .footer { color: #6b7280; font-size: 12px; margin-top: 32px; }
+</style>
+</head>
+<body>
+<div class="container">
+$summary
+$body
+<p class="footer">Generated by Deep Research on $date.</p>
+</div>
+</body>
+</html>
+""")
+
+
+def init_render_cache():
+    with chat_db.get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS email_render_cache (
+                report_hash TEXT PRIMARY KEY,
+                subject TEXT,
+                html TEXT,
+                created_at TIMESTAMP
+            )
+        """)
+
+
+def report_hash(markdown_report: str, short_summary: str = "") -> str:
+    return hashlib.sha256(f"{TEMPLATE_VERSION}\n{short_summary}\n{markdown_report}".encode("utf-8")).hexdigest()
+
+
+def _truncate(text: str, limit: int = SUBJECT_MAX_CHARS) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+
+
+def email_subject(markdown_report: str, short_summary: str = "") -> str:
+    """The summary's first sentence, else the report's first heading, else its first line"""
+    if short_summary.strip():
+        first_sentence = re.split(r"(?<=[.!?])\s", short_summary.strip(), maxsplit=1)[0]
+        return _truncate(first_sentence.rstrip("."))
+    heading = re.search(r"^#{1,3}\s+(.+?)\s*#*$", markdown_report, re.MULTILINE)
+    if heading:
+        return _truncate(re.sub(r"[*_`]", "", heading.group(1)))
+    first_line = next((line for line in markdown_report.splitlines() if line.strip()), "Research report")
+    return _truncate(re.sub(r"[#*_`>]", "", first_line).strip())
+
+
+def render_html(markdown_report: str, short_summary: str = "", subject: str = "") -> str:
+    body = markdown.markdown(markdown_report, extensions=["tables", "sane_lists", "fenced_code"])
+    summary = f'<div class="summary">{html.escape(short_summary)}</div>' if short_summary.strip() else ""
+    return _TEMPLATE.substitute(
+        title=html.escape(subject), summary=summary, body=body, date=datetime.now().strftime("%B %d, %Y")
+    )
+
+
+def render_report_email(markdown_report: str, short_summary: str = "") -> Tuple[str, str]:
+    """(subject, html) for a report, rendered once per distinct report"""
+    key = report_hash(markdown_report, short_summary)
+    cached = _cached(key)
+    if cached:
+        return cached
+    subject = email_subject(markdown_report, short_summary)
+    rendered = render_html(markdown_report, short_summary, subject)
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO email_render_cache (report_hash, subject, html, created_at) VALUES (?, ?, ?, ?)",
+            (key, subject, rendered, datetime.utcnow())
+        )
+    return subject, rendered
+
+
+def _cached(key: str) -> Optional[Tuple[str, str]]:
+    with chat_db.get_connection() as conn:
+        row = conn.execute("SELECT subject, html FROM email_render_cache WHERE report_hash = ?", (key,)).fetchone()
+    return (row[0], row[1]) if row else None
@@ -0,0 +1,169 @@
+"""Answers follow-up questions from the research a session already holds.
+
+The session's reports and the search summaries behind them are split into passages and indexed
+with BM25, locally and in memory. A question is answered from its best passages with one call to
+the followup agent. When those passages cover too few of the question's words, a couple of targeted
+searches are run first; their summaries are saved with the session so later follow-ups find them.
+"""
+import asyncio
+import math
+import os
+import re
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+
+import config  # noqa: F401
+import chat_db
+import research_checkpoints as checkpoints
+from research_jobs import get_session_job_ids
+from research_metrics import RunMetrics
+from search_dedup import topic_tokens
+from search_scheduler import new_scheduler
+
+PASSAGE_CHARS = 1200
+TOP_PASSAGES = 6
+# Share of the question's topic words the retrieved passages must contain to answer without searching
+MIN_COVERAGE = float(os.environ.get("FOLLOWUP_MIN_COVERAGE", 0.6))
+FOLLOWUP_SEARCHES = int(os.environ.get("FOLLOWUP_SEARCHES", 2))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+@dataclass
+class Passage:
+    source: str
+    text: str
+
+
+def chunk_markdown(text: str, source: str, limit: int = PASSAGE_CHARS) -> list[Passage]:
+    """Paragraph-aligned passages of at most about `limit` characters, each prefixed with its section heading"""
+    passages, heading, current = [], "", []
+
+    def flush():
+        if current:
+            body = "\n\n".join(current)
+            passages.append(Passage(source, f"{heading}\n{body}" if heading else body))
+            current.clear()
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.startswith("#"):
+            flush()
+            heading, _, rest = paragraph.partition("\n")
+            paragraph = rest.strip()
+            if not paragraph:
+                continue
+        if current and sum(len(part) for part in current) + len(paragraph) > limit:
+            flush()
+        current.append(paragraph)
+    flush()
+    return passages
+
+
+class BM25Index:
+    def __init__(self, passages: list[Passage]):
+        self.passages = passages
+        self.term_counts = [Counter(topic_tokens(passage.text)) for passage in passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if passages else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        self.idf = {
+            term: math.log(1 + (len(passages) - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def search(self, query: str, k: int = TOP_PASSAGES) -> list[tuple[float, Passage]]:
+        terms = set(topic_tokens(query))
+        scored = []
+        for passage, counts, length in zip(self.passages, self.term_counts, self.lengths):
+            score = 0.0
+            for term in terms & counts.keys():
+                tf = counts[term]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.average_length)
+                score += self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, passage))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return scored[:k]
+
+
+def coverage(question: str, passages: list[Passage]) -> float:
+    """Share of the question's topic words that appear in the passages"""
+    terms = set(topic_tokens(question))
+    if not terms:
+        return 1.0
+    found = set()
+    for passage in passages:
+        found |= terms & set(topic_tokens(passage.text))
+    return len(found) / len(terms)
+
+
+def _followup_run_id(session_id: str) -> str:
+    """Checkpoint run that holds the searches made for a session's follow-ups"""
+    return f"followup-{session_id}"
+
+
+# session_id -> (fingerprint, BM25Index); rebuilt when the session gets new messages or searches
+_indexes: dict = {}
+
+
+def session_index(session_id: str) -> BM25Index:
+    run_ids = get_session_job_ids(session_id) + [_followup_run_id(session_id)]
+    with chat_db.get_connection() as conn:
+        last_message = conn.execute(
+            "SELECT MAX(id) FROM chat_messages WHERE session_id = ? AND role = 'assistant'", (session_id,)
+        ).fetchone()[0]
+        searches = conn.execute(
+            f"SELECT COUNT(*) FROM research_run_results WHERE run_id IN ({', '.join('?' * len(run_ids))})", run_ids
+        ).fetchone()[0]
+    fingerprint = (last_message, searches)
+    cached = _indexes.get(session_id)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    passages = []
+    for role, content, _ in chat_db.get_chat_history(session_id):
+        if role == "assistant":
+            passages.extend(chunk_markdown(content, "Report"))
+    for query, result in checkpoints.search_summaries(run_ids):
+        passages.extend(chunk_markdown(result, f"Search summary for '{query}'"))
+    index = BM25Index(passages)
+    _indexes[session_id] = (fingerprint, index)
+    return index
+
+
+async def answer_followup(manager, session_id: str, question: str, topic: str = ""):
+    """Yields progress strings, then the answer.
+
+    `manager` is a ResearchManager; its router, search cache and scheduler serve the model call
+    and any targeted searches.
+    """
+    manager.metrics = RunMetrics(f"followup-{uuid.uuid4()}", kind="followup")
+    try:
+        passages = [passage for _, passage in session_index(session_id).search(question)]
+        if coverage(question, passages) < MIN_COVERAGE and FOLLOWUP_SEARCHES > 0:
+            yield "🌐 The earlier research doesn't cover this, running a couple of targeted searches..."
+            passages = await _search_more(manager, session_id, question, topic, passages)
+        yield "💡 Answering from the research..."
+        yield await manager.answer_followup(question, [f"({passage.source})\n{passage.text}" for passage in passages])
+    finally:
+        manager.metrics.flush()
+
+
+async def _search_more(manager, session_id: str, question: str, topic: str, passages: list[Passage]) -> list[Passage]:
+    """Run targeted searches for the question, save them with the session and re-rank the passages"""
+    context = f"Follow-up question about earlier research on {topic}: " if topic else ""
+    plan = await manager.plan_searches(f"{context}{question}", budget=FOLLOWUP_SEARCHES)
+    scheduler = new_scheduler()
+    results = await asyncio.gather(*(manager.search(item, scheduler) for item in plan.searches))
+    run_id = _followup_run_id(session_id)
+    checkpoints.start_run(run_id, f"Follow-ups for session {session_id}")
+    position = len(checkpoints.load_search_results(run_id))
+    for item, result in zip(plan.searches, results):
+        if result:
+            checkpoints.save_search_result(run_id, position, item, result)
+            position += 1
+            passages = passages + chunk_markdown(result, f"Search summary for '{item.query}'")
+    checkpoints.finish_run(run_id)
+    return [passage for _, passage in BM25Index(passages).search(question)] or passages
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+
+def instructions() -> str:
+    """Instructions for today's date"""
+    current_date = datetime.now().strftime('%B %d, %Y')
+    return (
+        f"You are a research assistant answering a follow-up question about research that has already been "
+        f"done. Today's date is {current_date}. You will be given the question and numbered passages taken "
+        f"from the earlier report and the search summaries behind it.\n"
+        f"Answer in markdown using only what the passages say, keeping their figures, names and dates. "
+        f"Be direct and concise: a few paragraphs or a short list, not a new report. If the passages do not "
+        f"answer part of the question, say which part. Do NOT include source URLs, links or citations."
+    )
+
+
+def build_agent():
+    from agents import Agent
+
+    return Agent(
+        name="FollowupAgent",
+        instructions=instructions(),
+        model="gpt-4o-mini",
+        output_type=str,
+    )
@@ -0,0 +1,153 @@
+"""Per-stage model selection with fallback chains, a fast mode and local OpenAI-compatible endpoints.
+
+Each stage (plan, search, synthesize, write, email, clarify, followup) has a chain of models tried in order
+until one answers. Chains come from the environment, e.g.
+
+    MODEL_PLAN=local:llama3.1,gpt-4o-mini     # try a local endpoint first, fall back to OpenAI
+    MODEL_WRITE=gpt-4o,gpt-4o-mini
+    MODEL_BUDGET_PLAN=5                       # seconds before the planner's model counts as too slow
+
+A `local:<name>` entry is served by LOCAL_MODEL_BASE_URL (any OpenAI-compatible server) through
+the Chat Completions API. Without a chain a stage uses the model its agent was built with.
+RESEARCH_FAST_MODE=1 puts FAST_MODEL first for the cheap stages.
+
+The agents SDK is imported when a model is first run rather than with this module (see agent_registry).
+"""
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+import config  # noqa: F401
+
+if TYPE_CHECKING:
+    from agents import Agent
+
+STAGES = ("plan", "search", "synthesize", "write", "email", "clarify", "followup")
+CHEAP_STAGES = ("plan", "synthesize", "email", "clarify", "followup")
+FAST_MODEL = os.environ.get("FAST_MODEL", "gpt-4.1-nano")
+LOCAL_PREFIX = "local:"
+# Weight of the newest call in a model's running latency average
+LATENCY_SMOOTHING = 0.3
+# Each time a too-slow model is passed over its average shrinks by this factor, so it is retried eventually
+SKIPPED_DECAY = 0.8
+
+
+def _env_chain(stage: str) -> list[str]:
+    return [model.strip() for model in os.environ.get(f"MODEL_{stage.upper()}", "").split(",") if model.strip()]
+
+
+def _env_budget(stage: str) -> Optional[float]:
+    budget = os.environ.get(f"MODEL_BUDGET_{stage.upper()}")
+    return float(budget) if budget else None
+
+
+def _fast_mode() -> bool:
+    return os.environ.get("RESEARCH_FAST_MODE", "").lower() in ("1", "true", "yes")
+
+
+class ModelRouter:
+    """Chooses and falls back between models per stage, learning each model's latency as it goes"""
+
+    def __init__(self, routes: dict = None, budgets: dict = None, fast_mode: bool = None,
+                 local_base_url: str = None):
+        self.routes = {stage: _env_chain(stage) for stage in STAGES} | (routes or {})
+        self.budgets = {stage: _env_budget(stage) for stage in STAGES} | (budgets or {})
+        self.fast_mode = _fast_mode() if fast_mode is None else fast_mode
+        self.local_base_url = local_base_url or os.environ.get("LOCAL_MODEL_BASE_URL", "http://localhost:11434/v1")
+        self.latency: dict = {}
+        self._clones: dict = {}
+        self._local_client = None
+
+    def chain(self, stage: str, agent: "Agent") -> list[str]:
+        """Models to try for `stage`, in order: configured chain, fast model first in fast mode,
+        and models whose average latency exceeds the stage's budget moved to the back"""
+        from agents import WebSearchTool
+
+        chain = list(self.routes.get(stage) or [agent.model])
+        if self.fast_mode and stage in CHEAP_STAGES:
+            chain = [FAST_MODEL] + [model for model in chain if model != FAST_MODEL]
+        if any(isinstance(tool, WebSearchTool) for tool in agent.tools):
+            # Hosted web search only exists in OpenAI's Responses API
+            chain = [model for model in chain if not model.startswith(LOCAL_PREFIX)] or [agent.model]
+        budget = self.budgets.get(stage)
+        if budget:
+            chain.sort(key=lambda model: self.latency.get((stage, model), 0) > budget)
+            for model in chain[1:]:
+                if self.latency.get((stage, model), 0) > budget:
+                    self.latency[(stage, model)] *= SKIPPED_DECAY
+        return chain
+
+    def agent_for(self, agent: "Agent", model: str) -> "Agent":
+        """`agent` running on `model`; clones are built once per model and rebuilt with the agent"""
+        if model == agent.model:
+            return agent
+        key = (agent.name, model)
+        cached = self._clones.get(key)
+        if cached is None or cached[0] is not agent:
+            cached = self._clones[key] = (agent, agent.clone(model=self._model(model)))
+        return cached[1]
+
+    def _model(self, model: str):
+        if not model.startswith(LOCAL_PREFIX):
+            return model
+        from agents import OpenAIChatCompletionsModel
+        from openai import AsyncOpenAI
+
+        if self._local_client is None:
+            self._local_client = AsyncOpenAI(
+                base_url=self.local_base_url, api_key=os.environ.get("LOCAL_MODEL_API_KEY", "local")
+            )
+        return OpenAIChatCompletionsModel(model=model[len(LOCAL_PREFIX):], openai_client=self._local_client)
+
+    def _observe(self, stage: str, model: str, seconds: float):
+        previous = self.latency.get((stage, model))
+        self.latency[(stage, model)] = seconds if previous is None else (
+            LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * previous
+        )
+
+    async def run(self, stage: str, agent: "Agent", input_text: str):
+        """Runner.run on the first model of the stage's chain that answers; returns (result, model).
+
+        A model that errors, or exceeds the stage's latency budget while later models remain, is
+        skipped for the next one. The last model's error is raised.
+        """
+        from agents import Runner
+
+        chain = self.chain(stage, agent)
+        budget = self.budgets.get(stage)
+        for position, model in enumerate(chain):
+            last = position == len(chain) - 1
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    Runner.run(self.agent_for(agent, model), input_text), timeout=None if last else budget
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Count a failure as twice over budget so budgeted chains try the model last for a while
+                self._observe(stage, model, max(time.monotonic() - start, budget or 0) * 2)
+                if last:
+                    raise
+                continue
+            self._observe(stage, model, time.monotonic() - start)
+            return result, model
+
+    def streamed(self, stage: str, agent: "Agent", input_text: str):
+        """Runner.run_streamed on the stage's preferred model (a stream that has started cannot fall back)"""
+        from agents import Runner
+
+        model = self.chain(stage, agent)[0]
+        return Runner.run_streamed(self.agent_for(agent, model), input_text), model
+
+
+_shared_router = None
+
+
+def get_router() -> ModelRouter:
+    """Process-wide router, so learned latencies carry over between runs"""
+    global _shared_router
+    if _shared_router is None:
+        _shared_router = ModelRouter()
+    return _shared_router
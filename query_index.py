@@ -0,0 +1,114 @@
+import os
+import threading
+import zlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+import numpy as np
+
+import config  # noqa: F401
+import chat_db
+from search_dedup import topic_tokens
+
+INDEX_PATH = os.environ.get("QUERY_INDEX_PATH", "query_index.f32")
+DIMENSIONS = 1024
+ROW_BYTES = DIMENSIONS * 4
+SIMILARITY_THRESHOLD = float(os.environ.get("QUERY_SIMILARITY_THRESHOLD", 0.6))
+
+
+def vectorize(text: str) -> np.ndarray:
+    """Hashing vectorizer over words and character 4-grams, sublinear TF, L2-normalized.
+
+    Character n-grams let paraphrases such as "benchmarks" / "benchmark results" overlap
+    without a stemmer or any network call.
+    """
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in topic_tokens(text):
+        features = [f"w:{word}"]
+        padded = f"^{word}$"
+        features += [padded[i:i + 4] for i in range(max(1, len(padded) - 3))]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % DIMENSIONS] += 1.0 if (h >> 31) & 1 else -1.0
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class QueryIndex:
+    """Similarity index over past (query, clarification) pairs and the messages holding their reports.
+
+    Vectors live in a flat float32 file that is memory-mapped for lookups; row metadata
+    lives in the report_index table of the chat database, whose row number is the
+    vector's position in the file.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or INDEX_PATH
+        self._matrix = None
+        self._rows = 0
+        self._lock = threading.Lock()
+        with chat_db.get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_index (
+                    row INTEGER PRIMARY KEY,
+                    session_id TEXT,
+                    query TEXT,
+                    clarification TEXT,
+                    message_id INTEGER,
+                    created_at TIMESTAMP
+                )
+            """)
+
+    def _load(self) -> Optional[np.ndarray]:
+        """Map the vector file, remapping only when other writers have appended to it"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        rows = size // ROW_BYTES
+        with self._lock:
+            if rows != self._rows:
+                self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, DIMENSIONS)) if rows else None
+                self._rows = rows
+            return self._matrix
+
+    def add(self, session_id: str, query: str, clarification: str, message_id: int):
+        vector = vectorize(f"{query} {clarification}")
+        conn = chat_db.get_connection()
+        # BEGIN IMMEDIATE takes the database write lock, which also serializes writers of the vector file
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM report_index").fetchone()[0]
+            with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as f:
+                f.seek(row * ROW_BYTES)
+                f.write(vector.tobytes())
+            conn.execute(
+                "INSERT INTO report_index (row, session_id, query, clarification, message_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (row, session_id, query, clarification, message_id, datetime.utcnow())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def most_similar(self, query: str, clarification: str = "",
+                     threshold: float = SIMILARITY_THRESHOLD) -> Optional[Tuple[float, dict]]:
+        """Best earlier match scoring at least `threshold`, as (score, metadata), or None"""
+        matrix = self._load()
+        if matrix is None:
+            return None
+        scores = matrix @ vectorize(f"{query} {clarification}")
+        top = np.argpartition(scores, -5)[-5:] if len(scores) > 5 else np.arange(len(scores))
+        for row in top[np.argsort(scores[top])[::-1]]:
+            if scores[row] < threshold:
+                return None
+            with chat_db.get_connection() as conn:
+                match = conn.execute(
+                    "SELECT r.session_id, r.query, r.clarification, r.message_id, r.created_at "
+                    "FROM report_index r JOIN chat_messages m ON m.id = r.message_id WHERE r.row = ?",
+                    (int(row),)
+                ).fetchone()
+            # Skip rows whose report was deleted along with its session
+            if match:
+                keys = ("session_id", "query", "clarification", "message_id", "created_at")
+                return float(scores[row]), dict(zip(keys, match))
+        return None
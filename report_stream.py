@@ -0,0 +1,65 @@
+import json
+import re
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStringFieldStream:
+    """Incrementally decodes one string field out of a JSON object that arrives in fragments.
+
+    The writer agent returns structured output, so its streamed text is the raw JSON of a
+    ReportData. Feeding that text in here yields the decoded markdown_report as it is written.
+    """
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self.done = False
+
+    def feed(self, fragment: str) -> str:
+        """Add raw JSON text and return whatever new field text can be decoded so far"""
+        if self.done:
+            return ""
+        self._buffer += fragment
+        if not self._started:
+            match = self._key.search(self._buffer)
+            if not match:
+                return ""
+            self._started = True
+            self._pos = match.end()
+        return self._decode()
+
+    def _decode(self) -> str:
+        out = []
+        buf, i = self._buffer, self._pos
+        while i < len(buf):
+            char = buf[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break
+            escape = buf[i + 1]
+            if escape != "u":
+                out.append(_ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            # \uXXXX, possibly the first half of a surrogate pair
+            if i + 6 > len(buf):
+                break
+            code = buf[i:i + 6]
+            if 0xD800 <= int(code[2:], 16) <= 0xDBFF:
+                if i + 12 > len(buf):
+                    break
+                code = buf[i:i + 12]
+            out.append(json.loads(f'"{code}"'))
+            i += len(code)
+        self._pos = i
+        return "".join(out)
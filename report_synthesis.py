@@ -0,0 +1,131 @@
+"""Map-reduce synthesis of many search results into writer input of bounded size.
+
+With more results than SYNTHESIS_FAN_OUT, results are clustered by topic and each cluster is
+drafted into a report section in parallel; drafts are condensed in groups of SYNTHESIS_FAN_OUT
+for up to SYNTHESIS_DEPTH levels, and the writer then merges the final drafts into the report.
+"""
+import math
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+
+import config  # noqa: F401
+from query_index import DIMENSIONS
+from search_dedup import topic_tokens
+
+SYNTHESIS_FAN_OUT = int(os.environ.get("SYNTHESIS_FAN_OUT", 8))
+SYNTHESIS_DEPTH = int(os.environ.get("SYNTHESIS_DEPTH", 2))
+# Section drafts written at once across the process, and attempts per draft
+SYNTHESIS_CONCURRENCY = int(os.environ.get("SYNTHESIS_CONCURRENCY", 4))
+SYNTHESIS_MAX_ATTEMPTS = 3
+
+
+def format_results(results: list[str], label: str = "Result") -> str:
+    """Numbered plain-text blocks; unlike the list's repr this adds no quotes or escaped newlines"""
+    return "\n\n".join(f"### {label} {i}\n{result.strip()}" for i, result in enumerate(results, 1))
+
+
+def _word_vector(text: str) -> np.ndarray:
+    """Hashed, sublinear word counts; cheaper than query_index.vectorize on summaries thousands of characters long"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word, count in Counter(topic_tokens(text)).items():
+        vector[zlib.crc32(word.encode("utf-8")) % DIMENSIONS] += 1 + math.log(count)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def similarity(a: str, b: str) -> float:
+    """Cosine similarity of two texts' word vectors"""
+    return float(_word_vector(a) @ _word_vector(b))
+
+
+def cluster_results(results: list[str], size: int) -> list[list[str]]:
+    """Split results into topically coherent clusters of at most `size`, keeping their order within a cluster.
+
+    Clusters are seeded farthest-first over the results' hashed word vectors; each result then
+    joins the most similar seed that still has room, the most clear-cut results choosing first.
+    """
+    count = math.ceil(len(results) / size)
+    if count <= 1:
+        return [results] if results else []
+    vectors = np.stack([_word_vector(result) for result in results])
+    seeds = [0]
+    closest = vectors @ vectors[0]
+    while len(seeds) < count:
+        seed = int(np.argmin(closest))
+        seeds.append(seed)
+        closest = np.maximum(closest, vectors @ vectors[seed])
+    similarity = vectors @ vectors[seeds].T
+    members = [[] for _ in seeds]
+    for index in np.argsort(-similarity.max(axis=1), kind="stable"):
+        for cluster in np.argsort(-similarity[index], kind="stable"):
+            if len(members[cluster]) < size:
+                members[cluster].append(int(index))
+                break
+    return [[results[i] for i in sorted(indexes)] for indexes in members if indexes]
+
+
+def groups(items: list[str], size: int) -> list[list[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def section_input(query: str, results: list[str]) -> str:
+    return f"Original query: {query}\n\nSearch summaries for this section:\n\n{format_results(results)}"
+
+
+def condense_input(query: str, drafts: list[str]) -> str:
+    return (
+        f"Original query: {query}\n\nCombine these section drafts into one section, keeping every "
+        f"concrete finding:\n\n{format_results(drafts, 'Draft')}"
+    )
+
+
+def merge_input(query: str, drafts: list[str]) -> str:
+    """Writer input built from section drafts instead of raw search results"""
+    return (
+        f"Original query: {query}\n\n"
+        f"The research has been drafted into the sections below, each written from a cluster of "
+        f"search results. Merge them into one cohesive report: order and connect the sections, "
+        f"remove overlap between them, and keep their concrete findings.\n\n"
+        f"{format_results(drafts, 'Section draft')}"
+    )
+
+
+def split_sections(markdown: str) -> list[str]:
+    """The report cut before each '## ' heading; the first part holds the title and introduction"""
+    sections, current = [], []
+    for line in markdown.splitlines(keepends=True):
+        if line.startswith("## ") and current:
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+def affected_sections(sections: list[str], findings: list[str]) -> dict[int, list[int]]:
+    """{section index: indexes of the findings it covers}, each finding going to its most similar section.
+
+    The introduction only receives findings when the report has no other sections.
+    """
+    candidates = list(range(1, len(sections))) or [0]
+    section_vectors = np.stack([_word_vector(sections[i]) for i in candidates])
+    affected: dict[int, list[int]] = {}
+    for finding_index, finding in enumerate(findings):
+        section = candidates[int(np.argmax(section_vectors @ _word_vector(finding)))]
+        affected.setdefault(section, []).append(finding_index)
+    return affected
+
+
+def patch_input(query: str, section: str, outdated: list[str], current: list[str]) -> str:
+    """Section writer input that updates one existing report section with newer search results"""
+    return (
+        f"Original query: {query}\n\nUpdate this existing report section with the newer search results "
+        f"below. Keep its '## ' heading and structure, replace findings the newer results supersede, add "
+        f"what is new, and leave everything else as it is.\n\n### Current section\n{section.strip()}\n\n"
+        + (f"### Earlier search results\n\n{format_results(outdated, 'Earlier result')}\n\n" if outdated else "")
+        + f"### Newer search results\n\n{format_results(current, 'Newer result')}"
+    )
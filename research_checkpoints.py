@@ -0,0 +1,154 @@
+"""Per-stage checkpoints of research runs, keyed by run id.
+
+ResearchManager.run saves the search plan, every search result as it completes and
+the final report, so a run that fails part way can be resumed without paying for the
+stages that already finished.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import chat_db
+from planner_agent import WebSearchItem, WebSearchPlan
+from writer_agent import ReportData
+
+REFRESH_STALE_SECONDS = 3600
+
+
+def init_checkpoints():
+    with chat_db.get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_runs (
+                run_id TEXT PRIMARY KEY,
+                query TEXT,
+                status TEXT,
+                created_at TIMESTAMP,
+                updated_at TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_run_plans (
+                run_id TEXT PRIMARY KEY,
+                plan TEXT,
+                created_at TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_run_results (
+                run_id TEXT,
+                position INTEGER,
+                query TEXT,
+                reason TEXT,
+                result TEXT,
+                completed_at TIMESTAMP,
+                PRIMARY KEY (run_id, position)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_run_reports (
+                run_id TEXT PRIMARY KEY,
+                report TEXT,
+                created_at TIMESTAMP
+            )
+        """)
+
+
+def start_run(run_id: str, query: str):
+    """Record a run; starting a run id that already exists (a resume) keeps its original query"""
+    now = datetime.utcnow()
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO research_runs (run_id, query, status, created_at, updated_at) "
+            "VALUES (?, ?, 'running', ?, ?)",
+            (run_id, query, now, now)
+        )
+        conn.execute(
+            "UPDATE research_runs SET status = 'running', updated_at = ? WHERE run_id = ?", (now, run_id)
+        )
+
+
+def start_refresh(run_id: str) -> bool:
+    """Mark a completed run as being refreshed; False if it is not completed, e.g. another refresh holds it.
+    A refresh that has not finished within REFRESH_STALE_SECONDS is taken to have died."""
+    now = datetime.utcnow()
+    with chat_db.get_connection() as conn:
+        cursor = conn.execute(
+            "UPDATE research_runs SET status = 'refreshing', updated_at = ? "
+            "WHERE run_id = ? AND (status = 'completed' OR (status = 'refreshing' AND updated_at < ?))",
+            (now, run_id, now - timedelta(seconds=REFRESH_STALE_SECONDS))
+        )
+    return cursor.rowcount == 1
+
+
+def finish_run(run_id: str, status: str = "completed"):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE research_runs SET status = ?, updated_at = ? WHERE run_id = ?",
+            (status, datetime.utcnow(), run_id)
+        )
+
+
+def get_run(run_id: str) -> Optional[dict]:
+    with chat_db.get_connection() as conn:
+        row = conn.execute(
+            "SELECT run_id, query, status, created_at, updated_at FROM research_runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+    return dict(zip(("run_id", "query", "status", "created_at", "updated_at"), row)) if row else None
+
+
+def save_plan(run_id: str, plan: WebSearchPlan):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO research_run_plans (run_id, plan, created_at) VALUES (?, ?, ?)",
+            (run_id, plan.model_dump_json(), datetime.utcnow())
+        )
+
+
+def load_plan(run_id: str) -> Optional[WebSearchPlan]:
+    with chat_db.get_connection() as conn:
+        row = conn.execute("SELECT plan FROM research_run_plans WHERE run_id = ?", (run_id,)).fetchone()
+    return WebSearchPlan.model_validate_json(row[0]) if row else None
+
+
+def save_search_result(run_id: str, position: int, item: WebSearchItem, result: str):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO research_run_results (run_id, position, query, reason, result, completed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, position, item.query, item.reason, result, datetime.utcnow())
+        )
+
+
+def load_search_results(run_id: str) -> Dict[int, Tuple[str, str]]:
+    """Completed searches of a run as {position in the plan: (result, completed_at)}"""
+    with chat_db.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT position, result, completed_at FROM research_run_results WHERE run_id = ? ORDER BY position",
+            (run_id,)
+        ).fetchall()
+    return {position: (result, completed_at) for position, result, completed_at in rows}
+
+
+def search_summaries(run_ids: List[str]) -> List[Tuple[str, str]]:
+    """(query, result) of every completed search in the given runs"""
+    if not run_ids:
+        return []
+    with chat_db.get_connection() as conn:
+        return conn.execute(
+            f"SELECT query, result FROM research_run_results WHERE run_id IN ({', '.join('?' * len(run_ids))}) "
+            "ORDER BY run_id, position",
+            run_ids
+        ).fetchall()
+
+
+def save_report(run_id: str, report: ReportData):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO research_run_reports (run_id, report, created_at) VALUES (?, ?, ?)",
+            (run_id, report.model_dump_json(), datetime.utcnow())
+        )
+
+
+def load_report(run_id: str) -> Optional[ReportData]:
+    with chat_db.get_connection() as conn:
+        row = conn.execute("SELECT report FROM research_run_reports WHERE run_id = ?", (run_id,)).fetchone()
+    return ReportData.model_validate_json(row[0]) if row else None
@@ -0,0 +1,428 @@
+"""Background research jobs.
+
+The Streamlit app submits a job and polls its event log; a separate worker pool
+process (`python research_jobs.py`) claims queued jobs and runs ResearchManager.run
+for them, and delivers queued report emails from the outbox. Jobs, events and worker
+heartbeats live in the chat database, so a run keeps going, and can be picked up
+again, after the browser tab is closed or refreshed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+import unicodedata
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import config  # noqa: F401
+import chat_db
+import email_outbox
+
+MAX_CONCURRENT_JOBS = int(os.environ.get("RESEARCH_WORKER_CONCURRENCY", 4))
+POLL_INTERVAL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 5
+# A running job whose worker has not sent a heartbeat for this long is put back in the queue
+STALE_AFTER_SECONDS = 120
+# Streamed report text is batched into one event at most this often
+REPORT_FLUSH_SECONDS = 0.5
+# The email outbox is started again this long after it fails
+OUTBOX_RESTART_SECONDS = 5
+# Where a worker pool started by the app logs, e.g. a failing email outbox
+WORKER_LOG = os.environ.get("RESEARCH_WORKER_LOG", "research_worker.log")
+
+logger = logging.getLogger(__name__)
+
+
+def init_jobs():
+    with chat_db.get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_jobs (
+                job_id TEXT PRIMARY KEY,
+                session_id TEXT,
+                query TEXT,
+                options TEXT,
+                status TEXT,
+                cancel_requested INTEGER DEFAULT 0,
+                worker_id TEXT,
+                created_at TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                heartbeat_at TIMESTAMP,
+                error TEXT,
+                message_id INTEGER
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_jobs_status ON research_jobs(status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_jobs_session ON research_jobs(session_id, status)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT,
+                kind TEXT,
+                content TEXT,
+                created_at TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_job_events_job ON research_job_events(job_id, id)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_workers (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                heartbeat_at TIMESTAMP
+            )
+        """)
+
+
+def submit_job(session_id: str, query: str, options: dict = None) -> str:
+    """Queue a research run and return its job id.
+
+    options are stored with the job and read by the worker, e.g. the original
+    `query` and `clarification` used to index the finished report.
+    """
+    job_id = str(uuid.uuid4())
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO research_jobs (job_id, session_id, query, options, status, created_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?)",
+            (job_id, session_id, query, json.dumps(options or {}), datetime.utcnow())
+        )
+    return job_id
+
+
+_JOB_COLUMNS = ("job_id", "session_id", "query", "options", "status", "cancel_requested",
+                "created_at", "started_at", "finished_at", "error", "message_id")
+
+
+def _job_from_row(row) -> dict:
+    job = dict(zip(_JOB_COLUMNS, row))
+    job["options"] = json.loads(job["options"] or "{}")
+    return job
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with chat_db.get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_JOB_COLUMNS)} FROM research_jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+    return _job_from_row(row) if row else None
+
+
+def get_active_job(session_id: str) -> Optional[dict]:
+    """The session's queued or running job, if any"""
+    with chat_db.get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_JOB_COLUMNS)} FROM research_jobs "
+            "WHERE session_id = ? AND status IN ('queued', 'running') ORDER BY created_at DESC LIMIT 1",
+            (session_id,)
+        ).fetchone()
+    return _job_from_row(row) if row else None
+
+
+def get_session_job_ids(session_id: str) -> List[str]:
+    """Ids of the session's succeeded jobs, which are also their checkpoint run ids"""
+    with chat_db.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT job_id FROM research_jobs WHERE session_id = ? AND status = 'succeeded' ORDER BY created_at",
+            (session_id,)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_message_run_id(message_id: int) -> Optional[str]:
+    """Checkpoint run behind a saved report; a refreshed report points back to the run it refreshed"""
+    with chat_db.get_connection() as conn:
+        row = conn.execute(
+            "SELECT job_id, options FROM research_jobs WHERE message_id = ? AND status = 'succeeded'", (message_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[1] or "{}").get("refresh_run_id") or row[0]
+
+
+def strip_progress(output: str) -> str:
+    """A job's saved output without the progress lines logged before its report"""
+    paragraphs = output.strip().split("\n\n")
+    # Progress lines, and only those, start with an emoji
+    while len(paragraphs) > 1 and unicodedata.category(paragraphs[0][:1] or " ") == "So":
+        paragraphs.pop(0)
+    return "\n\n".join(paragraphs)
+
+
+def get_events(job_id: str, after_id: int = 0) -> List[Tuple[int, str, str]]:
+    """Returns (id, kind, content) events logged after event `after_id`"""
+    with chat_db.get_connection() as conn:
+        return conn.execute(
+            "SELECT id, kind, content FROM research_job_events WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, after_id)
+        ).fetchall()
+
+
+def cancel_job(job_id: str):
+    """Cancel a queued job immediately; a running one is stopped by its worker within a poll interval"""
+    with chat_db.get_connection() as conn:
+        conn.execute("UPDATE research_jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+        cursor = conn.execute(
+            "UPDATE research_jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+            (datetime.utcnow(), job_id)
+        )
+        if cursor.rowcount:
+            _log_event(conn, job_id, "cancelled", "🛑 Research cancelled")
+
+
+def retry_job(job_id: str):
+    """Queue a failed or cancelled job again; it resumes from its checkpoints"""
+    with chat_db.get_connection() as conn:
+        cursor = conn.execute(
+            "UPDATE research_jobs SET status = 'queued', cancel_requested = 0, worker_id = NULL, error = NULL "
+            "WHERE job_id = ? AND status IN ('failed', 'cancelled')",
+            (job_id,)
+        )
+        if cursor.rowcount:
+            _log_event(conn, job_id, "status", "🔁 Retrying, completed stages will be reused")
+
+
+def _log_event(conn, job_id: str, kind: str, content: str):
+    conn.execute(
+        "INSERT INTO research_job_events (job_id, kind, content, created_at) VALUES (?, ?, ?, ?)",
+        (job_id, kind, content, datetime.utcnow())
+    )
+
+
+def log_event(job_id: str, kind: str, content: str):
+    with chat_db.get_connection() as conn:
+        _log_event(conn, job_id, kind, content)
+
+
+def _claim_job(worker_id: str) -> Optional[dict]:
+    conn = chat_db.get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT job_id FROM research_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row:
+            now = datetime.utcnow()
+            conn.execute(
+                "UPDATE research_jobs SET status = 'running', worker_id = ?, started_at = ?, heartbeat_at = ? "
+                "WHERE job_id = ?",
+                (worker_id, now, now, row[0])
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return get_job(row[0]) if row else None
+
+
+def _finish_job(job_id: str, status: str, error: str = None, message_id: int = None):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE research_jobs SET status = ?, finished_at = ?, error = ?, message_id = ? WHERE job_id = ?",
+            (status, datetime.utcnow(), error, message_id, job_id)
+        )
+        # The streamed preview is only needed while the job runs
+        conn.execute("DELETE FROM research_job_events WHERE job_id = ? AND kind = 'report_delta'", (job_id,))
+
+
+def _requeue_job(job_id: str):
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE research_jobs SET status = 'queued', worker_id = NULL WHERE job_id = ? AND status = 'running'",
+            (job_id,)
+        )
+
+
+def _requeue_stale_jobs():
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER_SECONDS)
+    with chat_db.get_connection() as conn:
+        conn.execute(
+            "UPDATE research_jobs SET status = 'queued', worker_id = NULL "
+            "WHERE status = 'running' AND heartbeat_at < ?",
+            (cutoff,)
+        )
+
+
+def _cancel_requested(job_id: str) -> bool:
+    with chat_db.get_connection() as conn:
+        row = conn.execute("SELECT cancel_requested FROM research_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return bool(row and row[0])
+
+
+def worker_alive() -> bool:
+    cutoff = datetime.utcnow() - timedelta(seconds=HEARTBEAT_SECONDS * 3)
+    with chat_db.get_connection() as conn:
+        row = conn.execute("SELECT 1 FROM research_workers WHERE heartbeat_at >= ? LIMIT 1", (cutoff,)).fetchone()
+    return row is not None
+
+
+def ensure_worker():
+    """Start a worker pool process in the background unless one is already running"""
+    if worker_alive():
+        return
+    with open(WORKER_LOG, "ab") as log:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            cwd=os.getcwd(),
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+            start_new_session=True,
+        )
+
+
+def _new_manager(options: dict):
+    from research_manager import ResearchManager
+    return ResearchManager(
+        stream_report=True,
+        pipelined=True,
+        search_deadline=float(os.environ.get("SEARCH_DEADLINE_SECONDS", 90)),
+        prefetched_searches=options.get("prefetched_searches"),
+    )
+
+
+async def _consume_run(job: dict) -> str:
+    """Iterate the research run, logging its progress; returns the full output saved to the chat"""
+    from research_manager import FinalReport, ReportDelta
+
+    job_id = job["job_id"]
+    output = ""
+    unflushed = ""
+    last_flush = 0.0
+    manager = _new_manager(job["options"])
+    refresh_run_id = job["options"].get("refresh_run_id")
+    if refresh_run_id:
+        # Refreshing an earlier report updates that run's checkpoints in place
+        chunks = manager.refresh(refresh_run_id)
+    else:
+        # The job id doubles as the checkpoint run id, so a requeued or retried job resumes
+        # from its last completed stage instead of starting over
+        chunks = manager.run(job["query"], run_id=job_id)
+    async for chunk in chunks:
+        if isinstance(chunk, ReportDelta):
+            unflushed += chunk
+            if time.monotonic() - last_flush >= REPORT_FLUSH_SECONDS:
+                log_event(job_id, "report_delta", unflushed)
+                unflushed = ""
+                last_flush = time.monotonic()
+            continue
+        if isinstance(chunk, FinalReport):
+            # The finished report replaces the streamed preview, which may be of a draft patched since
+            unflushed = ""
+        elif unflushed:
+            log_event(job_id, "report_delta", unflushed)
+            unflushed = ""
+        output += chunk + "\n\n"
+        log_event(job_id, "report" if isinstance(chunk, FinalReport) else "status", chunk)
+    return output
+
+
+async def run_job(job: dict):
+    """Run one job to completion, logging progress events and saving the result to the chat"""
+    from query_index import QueryIndex
+
+    job_id = job["job_id"]
+    task = asyncio.create_task(_consume_run(job))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=POLL_INTERVAL_SECONDS)
+            if not task.done() and _cancel_requested(job_id):
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        output = task.result()
+    except asyncio.CancelledError:
+        if not task.done():
+            # The worker is shutting down; hand the job to the next worker
+            task.cancel()
+            _requeue_job(job_id)
+            raise
+        log_event(job_id, "cancelled", "🛑 Research cancelled")
+        _finish_job(job_id, "cancelled")
+        return
+    except Exception as e:
+        log_event(job_id, "error", f"❌ Research failed: {e}")
+        _finish_job(job_id, "failed", error=str(e))
+        return
+
+    message_id = chat_db.save_message(job["session_id"], "assistant", output)
+    options = job["options"]
+    if "query" in options:
+        QueryIndex().add(job["session_id"], options["query"], options.get("clarification", ""), message_id)
+    _finish_job(job_id, "succeeded", message_id=message_id)
+    log_event(job_id, "done", "✅ Saved to the conversation")
+
+
+async def _heartbeat(worker_id: str, running: set):
+    while True:
+        now = datetime.utcnow()
+        with chat_db.get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO research_workers (worker_id, pid, heartbeat_at) VALUES (?, ?, ?)",
+                (worker_id, os.getpid(), now)
+            )
+            conn.executemany(
+                "UPDATE research_jobs SET heartbeat_at = ? WHERE job_id = ?",
+                [(now, job_id) for job_id in running]
+            )
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+
+
+async def run_worker(concurrency: int = MAX_CONCURRENT_JOBS):
+    """Claim and run queued jobs, up to `concurrency` at a time, until interrupted"""
+    chat_db.init_db()
+    init_jobs()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    running: set = set()
+    tasks: set = set()
+    heartbeat = asyncio.create_task(_heartbeat(worker_id, running))
+    outbox: dict = {}
+
+    def start_outbox():
+        outbox["task"] = asyncio.create_task(email_outbox.run_outbox())
+        outbox["task"].add_done_callback(restart_outbox)
+
+    def restart_outbox(task: asyncio.Task):
+        if task.cancelled():
+            return
+        logger.error("Email outbox stopped, restarting in %s seconds", OUTBOX_RESTART_SECONDS,
+                     exc_info=task.exception())
+        outbox["restart"] = asyncio.get_running_loop().call_later(OUTBOX_RESTART_SECONDS, start_outbox)
+
+    start_outbox()
+    try:
+        while True:
+            _requeue_stale_jobs()
+            job = _claim_job(worker_id) if len(tasks) < concurrency else None
+            if job is None:
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                continue
+            running.add(job["job_id"])
+            task = asyncio.create_task(run_job(job))
+            tasks.add(task)
+            task.add_done_callback(lambda t, job_id=job["job_id"]: (tasks.discard(t), running.discard(job_id)))
+    finally:
+        heartbeat.cancel()
+        if "restart" in outbox:
+            outbox["restart"].cancel()
+        outbox["task"].cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        with chat_db.get_connection() as conn:
+            conn.execute("DELETE FROM research_workers WHERE worker_id = ?", (worker_id,))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the background research worker pool")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_JOBS,
+                        help="How many research jobs to run at once")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(run_worker(args.concurrency))
+    except KeyboardInterrupt:
+        pass
@@ -1,26 +1,286 @@
 import asyncio
+import math
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
 from datetime import datetime
-from agents import Runner, trace, gen_trace_id
-from email_agent import email_agent
-from planner_agent import planner_agent, WebSearchItem, WebSearchPlan
-from writer_agent import writer_agent, ReportData
-from search_agent import search_agent
+from agent_registry import get_agent
+from planner_agent import WebSearchItem, WebSearchPlan
+from writer_agent import ReportData
+from search_cache import SearchCache
+from search_scheduler import ConcurrencyLimiter, SearchScheduler, new_scheduler
+from report_stream import JsonStringFieldStream
+from search_dedup import dedupe_plan, search_budget
+from research_metrics import RunMetrics, init_metrics
+import report_synthesis as synthesis
+from model_router import ModelRouter, get_router
+from email_outbox import enqueue_email, init_outbox, outbox_queued, outbox_session
+from email_render import EMAIL_RENDER_MODE, init_render_cache, render_report_email
+import research_checkpoints as checkpoints
+import chat_db
+
+# refresh() re-runs searches completed longer ago than this
+REFRESH_MAX_AGE_SECONDS = float(os.environ.get("REFRESH_MAX_AGE_HOURS", 24)) * 3600
+# A re-run search is never worded the same twice; its summary only counts as changed when its
+# word vector's cosine similarity to the earlier summary falls below this
+REFRESH_MIN_SIMILARITY = float(os.environ.get("REFRESH_MIN_SIMILARITY", 0.8))
+
+
+# Shared by every run's section drafts, like the search limits in search_scheduler
+_draft_limiter = ConcurrencyLimiter(synthesis.SYNTHESIS_CONCURRENCY)
+
+# Databases whose tables the manager needs have been created in this process
+_schema_lock = threading.Lock()
+_schema_ready: set = set()
+
+
+def init_schema():
+    """Create the checkpoint, metrics, outbox and render cache tables once per process and database"""
+    with _schema_lock:
+        if chat_db.DB_PATH in _schema_ready:
+            return
+        checkpoints.init_checkpoints()
+        init_metrics()
+        init_outbox()
+        init_render_cache()
+        _schema_ready.add(chat_db.DB_PATH)
+
+
+async def _cancel_all(tasks):
+    """Cancel the tasks still running and wait for them to finish"""
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+class ReportDelta(str):
+    """A fragment of the report yielded while the writer streams; the full report is still yielded at the end"""
+
+
+class FinalReport(str):
+    """The finished report, the last chunk of a run or refresh; it replaces any streamed ReportDelta preview"""
+
+
+@dataclass
+class PipelineOutcome:
+    """What the pipelined search stage hands to the writer"""
+    draft: ReportData | None = None
+    early_results: list[str] = field(default_factory=list)
+    late_results: list[str] = field(default_factory=list)
+    cancelled: list[WebSearchItem] = field(default_factory=list)
+
+    @property
+    def results(self) -> list[str]:
+        return self.early_results + self.late_results
+
 
 class ResearchManager:
-    async def run(self, query: str, recipient_email: str = None):
-        """Run the deep research process, yielding status updates and final report."""
+    def __init__(self, search_cache: SearchCache = None, stream_report: bool = False,
+                 pipelined: bool = False, quorum: float = 0.6, search_deadline: float | None = None,
+                 fan_out: int = synthesis.SYNTHESIS_FAN_OUT, synthesis_depth: int = synthesis.SYNTHESIS_DEPTH,
+                 router: ModelRouter = None, prefetched_searches: list[str] = None):
+        """
+        pipelined: start drafting the report once `quorum` (a fraction of the planned searches) have
+        returned, then patch the draft sections the remaining results touch.
+        search_deadline: seconds after which searches still running in pipelined mode are cancelled.
+        fan_out: with more results than this, sections are drafted in parallel from clusters of at most
+        fan_out results before the writer merges them (0 sends every result to the writer at once).
+        synthesis_depth: how many levels of section drafts may be condensed before the final merge.
+        router: picks each stage's model and falls back between models; the process-wide one by default.
+        prefetched_searches: queries already searched speculatively for this topic (see research_prefetch);
+        the planner repeats those that still fit word for word, and those are served from the search cache.
+        """
+        self.search_cache = search_cache if search_cache is not None else SearchCache()
+        self.stream_report = stream_report
+        self.pipelined = pipelined
+        self.quorum = quorum
+        self.search_deadline = search_deadline
+        self.fan_out = fan_out
+        self.synthesis_depth = synthesis_depth
+        self.router = router or get_router()
+        self.prefetched_searches = prefetched_searches or []
+        self.dropped_searches: list[WebSearchItem] = []
+        self.run_id: str | None = None
+        self.metrics = RunMetrics()
+        init_schema()
+
+    async def run(self, query: str, recipient_email: str = None, run_id: str = None):
+        """Run the deep research process, yielding status updates and final report.
+
+        Each stage is checkpointed under run_id (a new one by default); running again with
+        the id of an interrupted run skips the stages it already completed.
+        """
+        self.run_id = run_id or str(uuid.uuid4())
+        self.metrics = RunMetrics(self.run_id)
+        checkpoints.start_run(self.run_id, query)
+        try:
+            with self.metrics.timer("run"):
+                async for chunk in self._run_stages(query, recipient_email):
+                    yield chunk
+        except BaseException:
+            checkpoints.finish_run(self.run_id, "failed")
+            raise
+        finally:
+            self.metrics.flush()
+        checkpoints.finish_run(self.run_id)
+
+    async def resume(self, run_id: str, recipient_email: str = None):
+        """Continue a checkpointed run from its first unfinished stage"""
+        run = checkpoints.get_run(run_id)
+        if run is None:
+            raise ValueError(f"No research run with id {run_id}")
+        async for chunk in self.run(run["query"], recipient_email, run_id=run_id):
+            yield chunk
+
+    async def refresh(self, run_id: str, max_age: float = REFRESH_MAX_AGE_SECONDS):
+        """Bring a finished run's report up to date, yielding progress strings and finally the report.
+
+        Only searches completed more than `max_age` seconds ago are run again; searches whose cached
+        summary has changed since are taken from the cache. The section writer then patches just the
+        report sections the changed results touch. The run's checkpoints are updated in place, so the
+        next refresh starts from the new timestamps.
+        """
+        run = checkpoints.get_run(run_id)
+        search_plan = checkpoints.load_plan(run_id)
+        report = checkpoints.load_report(run_id)
+        if run is None or search_plan is None or report is None:
+            raise ValueError(f"No finished research run with id {run_id}")
+        # Two refreshes of one run would patch and save over each other
+        if not checkpoints.start_refresh(run_id):
+            raise RuntimeError("This report is already being refreshed")
+        self.run_id = run_id
+        self.metrics = RunMetrics(run_id)
+        try:
+            with self.metrics.timer("run"):
+                async for chunk in self._refresh(run["query"], search_plan, report, max_age):
+                    yield chunk
+        finally:
+            # A failed refresh leaves the earlier report in place, which is still complete
+            checkpoints.finish_run(run_id)
+            self.metrics.flush()
+
+    async def _refresh(self, query: str, search_plan: WebSearchPlan, report: ReportData, max_age: float):
+        with self.metrics.timer("sqlite"):
+            stored = checkpoints.load_search_results(self.run_id)
+        changed: dict[int, str] = {}
+        stale = []
+        now = datetime.utcnow()
+        for position, item in enumerate(search_plan.searches):
+            result, completed_at = stored.get(position, (None, None))
+            with self.metrics.timer("sqlite"):
+                cached = self.search_cache.get(item.query)
+            if cached is not None and self._changed(result, cached):
+                self.metrics.record("search", item.query, cache_hits=1)
+                changed[position] = cached
+            elif result is None or (now - datetime.fromisoformat(str(completed_at))).total_seconds() > max_age:
+                stale.append(position)
+
+        if stale:
+            yield f"🌐 Re-running {len(stale)} of {len(search_plan.searches)} searches that are out of date..."
+            scheduler = new_scheduler()
+            with self.metrics.timer("search"):
+                outcomes = await asyncio.gather(*(
+                    scheduler.submit(search_plan.searches[position], self._run_search) for position in stale
+                ))
+            for position, scheduled in zip(stale, outcomes):
+                item = search_plan.searches[position]
+                self.metrics.record("search", item.query, queue_wait_ms=scheduled.queue_wait * 1000,
+                                    retries=scheduled.attempts - 1)
+                if scheduled.result is None:
+                    continue
+                previous = stored.get(position, (None, None))[0]
+                if self._changed(previous, scheduled.result):
+                    changed[position] = scheduled.result
+                else:
+                    # Confirmed as of now. The earlier text is kept, since it is what the report was
+                    # written from; small rewordings must not add up unnoticed over several refreshes.
+                    with self.metrics.timer("sqlite"):
+                        checkpoints.save_search_result(self.run_id, position, item, previous)
+            self.dropped_searches = [scheduled.item for scheduled in scheduler.dropped]
+
+        if not changed:
+            yield f"✅ All {len(search_plan.searches)} search results are still current; the report is unchanged"
+            yield FinalReport(report.markdown_report)
+            return
+
+        positions = sorted(changed)
+        outdated = [stored.get(position, (None, None))[0] or "" for position in positions]
+        current = [changed[position] for position in positions]
+        async for update in self._patch_report(query, report, current, outdated, stage="write"):
+            if isinstance(update, ReportData):
+                report = update
+            else:
+                yield update
+
+        with self.metrics.timer("sqlite"):
+            for position in positions:
+                checkpoints.save_search_result(self.run_id, position, search_plan.searches[position], changed[position])
+            checkpoints.save_report(self.run_id, report)
+        yield f"✅ Report refreshed: {len(changed)} of {len(search_plan.searches)} search results changed"
+        yield FinalReport(report.markdown_report)
+
+    @staticmethod
+    def _changed(previous: str | None, current: str) -> bool:
+        return previous is None or synthesis.similarity(previous, current) < REFRESH_MIN_SIMILARITY
+
+    async def _patch_report(self, query: str, report: ReportData, current: list[str],
+                            outdated: list[str] = None, stage: str = "write"):
+        """Rewrite only the report sections the given search results touch; yields a status, then the ReportData.
+
+        outdated: the earlier text of each result, if any. A result belongs to the section that used its
+        earlier version, or the most similar section for a new result.
+        """
+        outdated = outdated or [""] * len(current)
+        sections = synthesis.split_sections(report.markdown_report)
+        affected = synthesis.affected_sections(sections, [old or new for old, new in zip(outdated, current)])
+        yield f"📝 Updating {len(affected)} of {len(sections)} report sections with {len(current)} search results..."
+        with self.metrics.timer(stage):
+            results = await asyncio.gather(*(
+                self._run_agent(stage, get_agent("section_writer"), synthesis.patch_input(
+                    query, sections[section], [outdated[i] for i in findings if outdated[i]],
+                    [current[i] for i in findings]
+                ), name="patch", route="write")
+                for section, findings in affected.items()
+            ))
+        for section, result in zip(affected, results):
+            sections[section] = str(result.final_output).strip() + "\n\n"
+        yield report.model_copy(update={"markdown_report": "".join(sections).strip()})
+
+    async def _run_stages(self, query: str, recipient_email: str = None):
+        # The agents SDK is imported on first use; see agent_registry
+        from agents import gen_trace_id, trace
+
         trace_id = gen_trace_id()
         with trace("Research trace", trace_id=trace_id):
             #yield f"🔗 View trace: https://platform.openai.com/traces/trace?trace_id={trace_id}"
 
-            yield "🔍 Planning searches..."
-            search_plan = await self.plan_searches(query)
-
-            yield "🌐 Performing web searches..."
-            search_results = await self.perform_searches(search_plan)
+            with self.metrics.timer("sqlite"):
+                search_plan = checkpoints.load_plan(self.run_id)
+                report = checkpoints.load_report(self.run_id)
+            if search_plan:
+                yield "♻️ Resuming an earlier run, reusing its search plan"
+            else:
+                yield "🔍 Planning searches..."
+                search_plan = await self.plan_searches(query)
+                search_plan, merged = dedupe_plan(search_plan)
+                if merged:
+                    yield f"🧹 Merged {merged} overlapping searches, running {len(search_plan.searches)}"
+                with self.metrics.timer("sqlite"):
+                    checkpoints.save_plan(self.run_id, search_plan)
 
-            yield "📝 Writing final report..."
-            report = await self.write_report(query, search_results)
+            if report:
+                yield "♻️ Reusing the report already written for this run"
+            else:
+                async for chunk in self._search_and_write(query, search_plan):
+                    if isinstance(chunk, ReportData):
+                        report = chunk
+                    else:
+                        yield chunk
+                with self.metrics.timer("sqlite"):
+                    checkpoints.save_report(self.run_id, report)
 
             if recipient_email:
                 yield f"📧 Sending report to {recipient_email}..."
@@ -28,50 +288,324 @@ class ResearchManager:
                 yield f"✅ Research complete. Report sent to {recipient_email}!"
             else:
                 yield "✅ Research complete!"
-            yield report.markdown_report
+            yield FinalReport(report.markdown_report)
+
+    async def _search_and_write(self, query: str, search_plan: WebSearchPlan):
+        """Search and write stages; yields progress and report fragments, then the final ReportData"""
+        with self.metrics.timer("sqlite"):
+            completed = checkpoints.load_search_results(self.run_id)
+        if completed:
+            yield f"♻️ Reusing {len(completed)} of {len(search_plan.searches)} search results from the earlier run"
 
-    async def plan_searches(self, query: str) -> WebSearchPlan:
+        yield "🌐 Performing web searches..."
+        if self.pipelined:
+            # Times its own search stage, which ends before it waits for the draft
+            async for update in self.perform_searches_pipelined(query, search_plan):
+                if isinstance(update, PipelineOutcome):
+                    outcome = update
+                else:
+                    yield update
+            search_results = outcome.results
+        else:
+            outcome = None
+            with self.metrics.timer("search"):
+                search_results = await self.perform_searches(search_plan)
+        if self.dropped_searches:
+            dropped = ", ".join(f"'{item.query}'" for item in self.dropped_searches)
+            yield f"⚠️ {len(self.dropped_searches)} searches failed after retries and were skipped: {dropped}"
+
+        if outcome and outcome.draft and not outcome.late_results:
+            yield outcome.draft
+            return
+        if outcome and outcome.draft:
+            # Only the sections the late results touch are rewritten, not the whole draft
+            yield f"🧩 Merging {len(outcome.late_results)} late search results into the draft..."
+            async for update in self._patch_report(query, outcome.draft, outcome.late_results, stage="merge"):
+                yield update
+            return
+        if self._needs_map_reduce(search_results):
+            clusters = math.ceil(len(search_results) / self.fan_out)
+            yield f"🗂️ Drafting {clusters} report sections from {len(search_results)} search results in parallel..."
+            input_text = await self._map_reduce_input(query, search_results)
+            yield "📝 Merging the sections into the final report..."
+        else:
+            yield "📝 Writing final report..."
+            input_text = self._writer_input(query, search_results)
+        async for chunk in self._write(input_text):
+            yield chunk if isinstance(chunk, ReportData) else ReportDelta(chunk)
+
+    async def plan_searches(self, query: str, budget: int = None) -> WebSearchPlan:
+        """Plan up to `budget` searches; by default the budget scales with the query's complexity"""
+        budget = budget or search_budget(query)
         current_date = datetime.now().strftime('%B %d, %Y')
-        result = await Runner.run(
-            planner_agent,
-            f"Today's date is {current_date}. Focus on finding the LATEST information.\n\nQuery: {query}"
+        prefetched = ""
+        if self.prefetched_searches:
+            prefetched = (
+                "These searches were already run before the user clarified the query. Reuse a search "
+                "word for word wherever it still fits the query, and replace those it no longer needs:\n"
+                + "\n".join(f"- {search}" for search in self.prefetched_searches) + "\n\n"
+            )
+        result = await self._run_agent(
+            "plan", get_agent("planner"),
+            f"Today's date is {current_date}. Focus on finding the LATEST information.\n"
+            f"Plan {budget} searches.\n\n{prefetched}Query: {query}"
         )
-        return result.final_output_as(WebSearchPlan)
+        plan = result.final_output_as(WebSearchPlan)
+        plan.searches = plan.searches[:budget]
+        return plan
+
+    async def clarify(self, query: str) -> str:
+        """Questions for the user that narrow the query down"""
+        result = await self._run_agent("clarify", get_agent("clarify"), query)
+        return str(result.final_output)
+
+    async def answer_followup(self, question: str, passages: list[str]) -> str:
+        """One cheap model call answering a follow-up question from retrieved passages (see followup.py)"""
+        input_text = f"Follow-up question: {question}\n\nPassages:\n\n{synthesis.format_results(passages, 'Passage')}"
+        result = await self._run_agent("followup", get_agent("followup"), input_text)
+        return str(result.final_output)
 
     async def perform_searches(self, search_plan: WebSearchPlan) -> list[str]:
-        tasks = [asyncio.create_task(self.search(item)) for item in search_plan.searches]
-        results = []
-        for task in asyncio.as_completed(tasks):
-            try:
+        """Run every planned search through a shared scheduler; failures are recorded in dropped_searches"""
+        scheduler = new_scheduler()
+        completed = self._completed_searches()
+        tasks = [
+            asyncio.create_task(self._checkpointed_search(position, item, scheduler))
+            for position, item in enumerate(search_plan.searches) if position not in completed
+        ]
+        results = list(completed.values())
+        try:
+            for task in asyncio.as_completed(tasks):
                 result = await task
                 if result:
                     results.append(result)
-            except Exception:
-                continue
+        finally:
+            # A cancelled run must not keep searching, or holding the shared limiter's slots
+            await _cancel_all(tasks)
+        self.dropped_searches = [scheduled.item for scheduled in scheduler.dropped]
         return results
 
-    async def search(self, item: WebSearchItem) -> str | None:
+    def _completed_searches(self) -> dict[int, str]:
+        """Results already checkpointed for the current run, by position in the plan"""
+        if not self.run_id:
+            return {}
+        with self.metrics.timer("sqlite"):
+            completed = checkpoints.load_search_results(self.run_id)
+        return {position: result for position, (result, _) in completed.items()}
+
+    async def _checkpointed_search(self, position: int, item: WebSearchItem,
+                                   scheduler: SearchScheduler) -> str | None:
+        result = await self.search(item, scheduler)
+        if result and self.run_id:
+            with self.metrics.timer("sqlite"):
+                checkpoints.save_search_result(self.run_id, position, item, result)
+        return result
+
+    async def search(self, item: WebSearchItem, scheduler: SearchScheduler = None) -> str | None:
+        with self.metrics.timer("sqlite"):
+            # A prefetched search the planner repeated word for word is a hit here, since the cache
+            # keys on the normalized query. One merely like it is searched again: the clarification
+            # may be exactly what sets the two apart.
+            cached = self.search_cache.get(item.query)
+        if cached is not None:
+            self.metrics.record("search", item.query, cache_hits=1)
+            return cached
+        scheduler = scheduler or new_scheduler()
+        scheduled = await scheduler.submit(item, self._run_search)
+        self.metrics.record("search", item.query, queue_wait_ms=scheduled.queue_wait * 1000,
+                            retries=scheduled.attempts - 1)
+        return scheduled.result
+
+    async def _run_search(self, item: WebSearchItem) -> str:
+        """One search agent call; raises on failure so the scheduler can retry it"""
         input_text = f"Search term: {item.query}\nReason: {item.reason}"
+        result = await self._run_agent("search", get_agent("search"), input_text, name=item.query)
+        output = str(result.final_output)
+        with self.metrics.timer("sqlite"):
+            self.search_cache.set(item.query, output)
+        return output
+
+    async def _run_agent(self, stage: str, agent, input_text: str, name: str = "", route: str = None):
+        """Run `agent` on the stage's routed model, recording wall time and token usage under (stage, name).
+        `route` picks the model by another stage's chain, for stages measured apart from the one they route as."""
+        with self.metrics.timer(stage, name):
+            result, model = await self.router.run(route or stage, agent, input_text)
+        self.metrics.record_usage(stage, name, result, model=model)
+        return result
+
+    async def perform_searches_pipelined(self, query: str, search_plan: WebSearchPlan):
+        """Run the searches, starting a draft report once a quorum has returned.
+
+        Yields progress strings and finally a PipelineOutcome. Searches still running at
+        search_deadline are cancelled. The `search` stage is timed until the last search ends;
+        the draft written meanwhile is timed under `write`.
+        """
+        start = time.perf_counter()
+        scheduler = new_scheduler()
+        completed = self._completed_searches()
+        tasks = {
+            asyncio.create_task(self._checkpointed_search(position, item, scheduler)): item
+            for position, item in enumerate(search_plan.searches) if position not in completed
+        }
+        quorum = max(1, math.ceil(len(search_plan.searches) * self.quorum))
+        deadline = time.monotonic() + self.search_deadline if self.search_deadline else None
+        outcome = PipelineOutcome(early_results=list(completed.values()))
+        draft_task = None
+        # Fragments of the streamed draft, yielded between search completions
+        deltas: asyncio.Queue = asyncio.Queue()
+        next_delta = asyncio.create_task(deltas.get())
+        pending = set(tasks)
         try:
-            result = await Runner.run(search_agent, input_text)
+            while pending:
+                timeout = max(0.0, deadline - time.monotonic()) if deadline else None
+                done, _ = await asyncio.wait(pending | {next_delta}, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    await _cancel_all(pending)
+                    outcome.cancelled = [tasks[task] for task in pending]
+                    yield f"⏱️ Search deadline reached, cancelled {len(pending)} slow searches"
+                    break
+                if next_delta in done:
+                    done.discard(next_delta)
+                    yield ReportDelta(next_delta.result())
+                    next_delta = asyncio.create_task(deltas.get())
+                pending -= done
+                for task in done:
+                    result = task.result()
+                    if result:
+                        (outcome.late_results if draft_task else outcome.early_results).append(result)
+                if draft_task is None and len(outcome.early_results) >= quorum and pending:
+                    draft_task = asyncio.create_task(self._write_draft(query, outcome.early_results, deltas))
+                    yield f"📝 {len(outcome.early_results)} of {len(search_plan.searches)} searches done, drafting the report while the rest finish..."
+            self.metrics.record("search", wall_ms=(time.perf_counter() - start) * 1000)
+            self.dropped_searches = [scheduled.item for scheduled in scheduler.dropped]
+            while draft_task and not (draft_task.done() and deltas.empty() and not next_delta.done()):
+                done, _ = await asyncio.wait({draft_task, next_delta}, return_when=asyncio.FIRST_COMPLETED)
+                if next_delta in done:
+                    yield ReportDelta(next_delta.result())
+                    next_delta = asyncio.create_task(deltas.get())
+            if draft_task:
+                try:
+                    outcome.draft = draft_task.result()
+                except Exception:
+                    # Fall back to writing the whole report from every result
+                    yield "⚠️ Draft report failed, writing the full report instead"
+        finally:
+            # Closing the generator early, e.g. when the job is cancelled, stops the searches and the draft
+            await _cancel_all(set(tasks) | {next_delta} | ({draft_task} if draft_task else set()))
+        yield outcome
+
+    async def _write_draft(self, query: str, search_results: list[str], deltas: asyncio.Queue) -> ReportData:
+        """The quorum draft; with stream_report its markdown fragments are put on `deltas` as they are written"""
+        if not self.stream_report:
+            return await self.write_report(query, search_results)
+        async for chunk in self.write_report_streamed(query, search_results):
+            if isinstance(chunk, ReportData):
+                return chunk
+            deltas.put_nowait(chunk)
+
+    def _writer_input(self, query: str, search_results: list[str]) -> str:
+        return f"Original query: {query}\n\nSummarized search results:\n\n{synthesis.format_results(search_results)}"
+
+    def _needs_map_reduce(self, search_results: list[str]) -> bool:
+        return self.fan_out > 0 and len(search_results) > self.fan_out
+
+    async def _map_reduce_input(self, query: str, search_results: list[str]) -> str:
+        """Draft sections from clusters of results in parallel, condensing drafts level by level until
+        at most fan_out remain or synthesis_depth levels are used; returns the writer's merge input"""
+        with self.metrics.timer("synthesize"):
+            clusters = synthesis.cluster_results(search_results, self.fan_out)
+            drafts = await self._draft_sections(
+                [(synthesis.section_input(query, cluster), synthesis.format_results(cluster)) for cluster in clusters],
+                level=1
+            )
+            level = 1
+            while len(drafts) > self.fan_out and level < self.synthesis_depth:
+                level += 1
+                drafts = await self._draft_sections(
+                    [(synthesis.condense_input(query, group), "\n\n".join(group))
+                     for group in synthesis.groups(drafts, self.fan_out)],
+                    level=level
+                )
+        return synthesis.merge_input(query, drafts)
+
+    async def _draft_sections(self, inputs: list[tuple[str, str]], level: int) -> list[str]:
+        """Draft a section from each (input, fallback) pair, at most SYNTHESIS_CONCURRENCY at a time.
+        A draft that still fails after retries is replaced by its fallback, the material it was drafted from."""
+        scheduler = SearchScheduler(limiter=_draft_limiter, bucket=None, max_attempts=synthesis.SYNTHESIS_MAX_ATTEMPTS)
+
+        async def draft(input_text: str) -> str:
+            result = await self._run_agent("synthesize", get_agent("section_writer"), input_text, name=f"level {level}")
             return str(result.final_output)
-        except Exception:
-            return None
+
+        outcomes = await asyncio.gather(*(scheduler.submit(input_text, draft) for input_text, _ in inputs))
+        for scheduled in outcomes:
+            self.metrics.record("synthesize", f"level {level}", queue_wait_ms=scheduled.queue_wait * 1000,
+                                retries=scheduled.attempts - 1)
+        return [fallback if scheduled.dropped else scheduled.result
+                for scheduled, (_, fallback) in zip(outcomes, inputs)]
+
+    async def _synthesis_input(self, query: str, search_results: list[str]) -> str:
+        if self._needs_map_reduce(search_results):
+            return await self._map_reduce_input(query, search_results)
+        return self._writer_input(query, search_results)
+
+    async def _write(self, input_text: str):
+        """Run the writer, yielding markdown fragments if streaming is enabled, then the final ReportData"""
+        if self.stream_report:
+            async for chunk in self._stream_writer(input_text):
+                yield chunk
+        else:
+            result = await self._run_agent("write", get_agent("writer"), input_text)
+            yield result.final_output_as(ReportData)
+
+    async def _stream_writer(self, input_text: str):
+        from openai.types.responses import ResponseTextDeltaEvent
+
+        start = time.perf_counter()
+        result, model = self.router.streamed("write", get_agent("writer"), input_text)
+        markdown = JsonStringFieldStream("markdown_report")
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                delta = markdown.feed(event.data.delta)
+                if delta:
+                    yield delta
+        self.metrics.record("write", wall_ms=(time.perf_counter() - start) * 1000)
+        self.metrics.record_usage("write", "", result, model=model)
+        yield result.final_output_as(ReportData)
 
     async def write_report(self, query: str, search_results: list[str]) -> ReportData:
-        input_text = f"Original query: {query}\n\nSummarized search results: {search_results}"
-        result = await Runner.run(writer_agent, input_text)
+        result = await self._run_agent("write", get_agent("writer"), await self._synthesis_input(query, search_results))
         return result.final_output_as(ReportData)
 
-    async def send_email(self, report: ReportData, recipient_email: str) -> None:
-        await Runner.run(
-            email_agent,
-            f"Send this report to {recipient_email}.\n\nReport:\n{report.markdown_report}"
-        )
+    async def write_report_streamed(self, query: str, search_results: list[str]):
+        """Yield markdown fragments of the report as the writer produces them, then the final ReportData"""
+        async for chunk in self._stream_writer(await self._synthesis_input(query, search_results)):
+            yield chunk
 
-    async def send_email_report(self, report_content: str, recipient_email: str) -> None:
-        """Send a report via email given raw report content and recipient email."""
-        await Runner.run(
-            email_agent,
-            f"Send this report to {recipient_email}.\n\nReport:\n{report_content}"
-        )
+    async def send_email(self, report: ReportData, recipient_email: str, session_id: str = None) -> list[int]:
+        """Queue the report email; returns the ids of the queued emails, whose status email_outbox.get_email reads"""
+        return await self._queue_email(report.markdown_report, recipient_email, report.short_summary, session_id)
+
+    async def send_email_report(self, report_content: str, recipient_email: str, session_id: str = None) -> list[int]:
+        """Queue a report email given raw report content and recipient email; the outbox delivers it."""
+        return await self._queue_email(report_content, recipient_email, session_id=session_id)
+
+    async def _queue_email(self, markdown_report: str, recipient_email: str, short_summary: str = "",
+                           session_id: str = None) -> list[int]:
+        """Render the email from the template, or have email_agent write it when EMAIL_RENDER_MODE is "llm" """
+        if EMAIL_RENDER_MODE != "llm":
+            with self.metrics.timer("email"):
+                subject, html_body = render_report_email(markdown_report, short_summary)
+                return [enqueue_email(recipient_email, subject, html_body, session_id)]
+        queued = []
+        session_token, queued_token = outbox_session.set(session_id), outbox_queued.set(queued)
+        try:
+            await self._run_agent(
+                "email", get_agent("email"),
+                f"Send this report to {recipient_email}.\n\nReport:\n{markdown_report}"
+            )
+        finally:
+            outbox_queued.reset(queued_token)
+            outbox_session.reset(session_token)
+        return queued
@@ -0,0 +1,264 @@
+"""Local per-stage instrumentation for research runs.
+
+ResearchManager records wall time, queue wait, retries, cache hits and token usage
+for every stage and search into a RunMetrics, which is written to the research_metrics
+table when the run ends. Rows with an empty name time a whole stage; named rows (one
+per search query) break a stage down and are not counted again in its wall time.
+In pipelined runs the draft is timed under `write`, overlapping the searches still running
+under `search`, and patching late results into its sections under `merge`. `stage_summary()`, shown in the app's sidebar, is cached until another
+run's metrics are written. `prometheus_text()` renders the totals in the Prometheus text format;
+`python research_metrics.py --serve 9464` serves them over HTTP.
+"""
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import List, Tuple
+
+import chat_db
+
+# USD per million tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+_NUMERIC_FIELDS = ("wall_ms", "queue_wait_ms", "input_tokens", "output_tokens", "requests", "retries", "cache_hits")
+
+# A run's kind is "research", or "prefetch" or "followup" for the speculative searches and
+# follow-up answers, which have no write or email stage and are left out of stage_summary.
+# Runs recorded before the kind was stored get it from the prefix their ids were given.
+_KIND_FROM_RUN_ID = (
+    "CASE WHEN run_id LIKE 'prefetch-%' THEN 'prefetch' WHEN run_id LIKE 'followup-%' THEN 'followup' "
+    "ELSE 'research' END"
+)
+
+# stage_summary results, keyed by metrics_version like chat_db's session index cache
+_summary_lock = threading.Lock()
+_summary_cache = {"version": None, "summaries": {}}
+
+
+def init_metrics():
+    with chat_db.get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT,
+                stage TEXT,
+                name TEXT,
+                model TEXT,
+                wall_ms REAL,
+                queue_wait_ms REAL,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                requests INTEGER,
+                retries INTEGER,
+                cache_hits INTEGER,
+                cost_usd REAL,
+                created_at TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_metrics_stage ON research_metrics(stage, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_metrics_run ON research_metrics(run_id)")
+        # One row per run, moved to the end whenever the run's metrics are written, so the latest
+        # runs and a version for stage_summary's cache are read without scanning research_metrics
+        backfill = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'research_metric_runs'"
+        ).fetchone() is None
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_metric_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT UNIQUE,
+                kind TEXT,
+                flushed_at TIMESTAMP
+            )
+        """)
+        if backfill:
+            conn.execute(
+                f"INSERT INTO research_metric_runs (run_id, kind, flushed_at) "
+                f"SELECT run_id, {_KIND_FROM_RUN_ID}, MAX(created_at) FROM research_metrics WHERE run_id IS NOT NULL "
+                f"GROUP BY run_id ORDER BY MAX(created_at)"
+            )
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(research_metric_runs)")]
+        if "kind" not in columns:
+            conn.execute("ALTER TABLE research_metric_runs ADD COLUMN kind TEXT")
+            conn.execute(f"UPDATE research_metric_runs SET kind = {_KIND_FROM_RUN_ID}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_metric_runs_kind ON research_metric_runs(kind, id)")
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model or "", (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class RunMetrics:
+    """Measurements for one run, keyed by (stage, name); repeated records for a key add up"""
+
+    def __init__(self, run_id: str = None, kind: str = "research"):
+        self.run_id = run_id
+        self.kind = kind
+        self.records: dict = {}
+
+    def record(self, stage: str, name: str = "", model: str = None, **values):
+        entry = self.records.setdefault((stage, name), dict.fromkeys(_NUMERIC_FIELDS, 0) | {"model": None})
+        for field, value in values.items():
+            entry[field] += value or 0
+        if model:
+            entry["model"] = model
+
+    def record_usage(self, stage: str, name: str, result, model: str = None):
+        """Add the token usage of an agents SDK run result"""
+        usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+        if usage is None:
+            return
+        self.record(stage, name, model=model, input_tokens=usage.input_tokens,
+                    output_tokens=usage.output_tokens, requests=usage.requests)
+
+    @contextmanager
+    def timer(self, stage: str, name: str = ""):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, name, wall_ms=(time.perf_counter() - start) * 1000)
+
+    def flush(self):
+        """Write the collected records and start over"""
+        if not self.records:
+            return
+        now = datetime.utcnow()
+        rows = [
+            (self.run_id, stage, name, entry["model"], entry["wall_ms"], entry["queue_wait_ms"],
+             entry["input_tokens"], entry["output_tokens"], entry["requests"], entry["retries"], entry["cache_hits"],
+             estimate_cost(entry["model"], entry["input_tokens"], entry["output_tokens"]), now)
+            for (stage, name), entry in self.records.items()
+        ]
+        with chat_db.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO research_metrics (run_id, stage, name, model, wall_ms, queue_wait_ms, input_tokens, "
+                "output_tokens, requests, retries, cache_hits, cost_usd, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            if self.run_id:
+                conn.execute(
+                    "INSERT OR REPLACE INTO research_metric_runs (run_id, kind, flushed_at) VALUES (?, ?, ?)",
+                    (self.run_id, self.kind, now)
+                )
+        self.records = {}
+
+
+def metrics_version() -> Tuple[str, int]:
+    """Changes whenever a run's metrics are written, in this process or another"""
+    with chat_db.get_connection() as conn:
+        row = conn.execute("SELECT MAX(id) FROM research_metric_runs").fetchone()
+    return chat_db.DB_PATH, row[0] or 0
+
+
+def stage_summary(last_runs: int = 50) -> List[dict]:
+    """Per-stage averages over the most recent research runs, slowest stage first, served from memory
+    until a run finishes"""
+    version = metrics_version()
+    with _summary_lock:
+        if _summary_cache["version"] != version:
+            _summary_cache["version"], _summary_cache["summaries"] = version, {}
+        summary = _summary_cache["summaries"].get(last_runs)
+    if summary is not None:
+        return summary
+    with chat_db.get_connection() as conn:
+        rows = conn.execute(
+            """SELECT stage, COUNT(DISTINCT run_id), TOTAL(CASE WHEN name = '' THEN wall_ms END),
+                      TOTAL(input_tokens + output_tokens), TOTAL(cost_usd), TOTAL(retries)
+               FROM research_metrics
+               WHERE run_id IN (SELECT run_id FROM research_metric_runs WHERE kind = 'research'
+                                ORDER BY id DESC LIMIT ?)
+               GROUP BY stage
+               ORDER BY 3 DESC""",
+            (last_runs,)
+        ).fetchall()
+    summary = [
+        {"stage": stage, "runs": runs, "avg_seconds": wall / runs / 1000, "avg_tokens": tokens / runs,
+         "avg_cost_usd": cost / runs, "retries": int(retries)}
+        for stage, runs, wall, tokens, cost, retries in rows
+    ]
+    with _summary_lock:
+        if _summary_cache["version"] == version:
+            _summary_cache["summaries"][last_runs] = summary
+    return summary
+
+
+def run_stages(run_id: str) -> dict:
+    """{stage: {"seconds", "tokens", "cost_usd", "cache_hits", "retries"}} for one run, over all its attempts"""
+    with chat_db.get_connection() as conn:
+        rows = conn.execute(
+            """SELECT stage, TOTAL(CASE WHEN name = '' THEN wall_ms END), TOTAL(input_tokens + output_tokens),
+                      TOTAL(cost_usd), TOTAL(cache_hits), TOTAL(retries)
+               FROM research_metrics WHERE run_id = ? GROUP BY stage""",
+            (run_id,)
+        ).fetchall()
+    return {
+        stage: {"seconds": round(wall / 1000, 3), "tokens": int(tokens), "cost_usd": round(cost, 6),
+                "cache_hits": int(cache_hits), "retries": int(retries)}
+        for stage, wall, tokens, cost, cache_hits, retries in rows
+    }
+
+
+def prometheus_text() -> str:
+    """Totals over all recorded runs in the Prometheus text exposition format"""
+    with chat_db.get_connection() as conn:
+        stages = conn.execute(
+            """SELECT stage, TOTAL(CASE WHEN name = '' THEN wall_ms END), TOTAL(CASE WHEN name != '' THEN wall_ms END),
+                      TOTAL(queue_wait_ms), TOTAL(input_tokens), TOTAL(output_tokens), TOTAL(retries),
+                      TOTAL(cache_hits), TOTAL(cost_usd)
+               FROM research_metrics GROUP BY stage ORDER BY stage"""
+        ).fetchall()
+        runs = conn.execute("SELECT COUNT(DISTINCT run_id) FROM research_metrics").fetchone()[0]
+    lines = [
+        "# HELP research_runs_total Research runs with recorded metrics.",
+        "# TYPE research_runs_total counter",
+        f"research_runs_total {runs}",
+    ]
+    metrics = [
+        ("research_stage_seconds_total", "Wall time spent per stage.", lambda r: r[1] / 1000),
+        ("research_item_seconds_total", "Wall time of the individual calls within a stage, summed.", lambda r: r[2] / 1000),
+        ("research_queue_wait_seconds_total", "Time spent waiting for the search scheduler.", lambda r: r[3] / 1000),
+        ("research_input_tokens_total", "Model input tokens per stage.", lambda r: int(r[4])),
+        ("research_output_tokens_total", "Model output tokens per stage.", lambda r: int(r[5])),
+        ("research_retries_total", "Retried model calls per stage.", lambda r: int(r[6])),
+        ("research_cache_hits_total", "Searches served from the search cache.", lambda r: int(r[7])),
+        ("research_cost_usd_total", "Estimated model cost per stage.", lambda r: r[8]),
+    ]
+    for metric, help_text, value in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for row in stages:
+            lines.append(f'{metric}{{stage="{row[0]}"}} {value(row)}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print or serve research metrics in Prometheus text format")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Serve /metrics on this port instead of printing")
+    args = parser.parse_args()
+    init_metrics()
+    if args.serve:
+        HTTPServer(("", args.serve), _MetricsHandler).serve_forever()
+    else:
+        print(prometheus_text(), end="")
@@ -0,0 +1,101 @@
+"""Speculative research started as soon as the user names a topic.
+
+While the user reads and answers the clarifying questions, one background thread asks clarify_agent
+for those questions and, at the same time, plans and searches the raw topic as if no clarification
+were coming. The search summaries land in the shared search cache. When the research job is
+submitted the searches still running are cancelled, and the queries that had completed are passed to
+ResearchManager as `prefetched_searches`: the planner keeps the ones the clarification has not made
+irrelevant, and those are served from the cache instead of searched again.
+"""
+import asyncio
+import threading
+import uuid
+from typing import Optional
+
+from research_metrics import RunMetrics
+
+# How long take_completed waits for cancelled searches to unwind
+CANCEL_WAIT_SECONDS = 2.0
+
+
+class Prefetch:
+    """Clarifying questions and speculative searches for one topic, produced in a daemon thread"""
+
+    def __init__(self, query: str, manager_factory=None):
+        self.query = query
+        self.questions: Optional[str] = None
+        self.clarify_error: Optional[str] = None
+        self.planned: list[str] = []
+        self.completed: list[str] = []
+        self.clarified = threading.Event()
+        self.done = threading.Event()
+        self._cancelled = threading.Event()
+        self._manager_factory = manager_factory
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            asyncio.run(self._prefetch())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.clarified.set()
+            self.done.set()
+
+    async def _prefetch(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if self._cancelled.is_set():
+            return
+        if self._manager_factory:
+            manager = self._manager_factory()
+        else:
+            from research_manager import ResearchManager
+            manager = ResearchManager()
+        # Speculative work is measured like a run of its own, so its cost shows up in the metrics
+        manager.metrics = RunMetrics(f"prefetch-{uuid.uuid4()}", kind="prefetch")
+        try:
+            await asyncio.gather(self._clarify(manager), self._plan_and_search(manager), return_exceptions=True)
+        finally:
+            manager.metrics.flush()
+
+    async def _clarify(self, manager):
+        try:
+            self.questions = await manager.clarify(self.query)
+        except Exception as e:
+            self.clarify_error = str(e)
+        finally:
+            self.clarified.set()
+
+    async def _plan_and_search(self, manager):
+        from search_dedup import dedupe_plan
+        from search_scheduler import new_scheduler
+
+        plan, _ = dedupe_plan(await manager.plan_searches(self.query))
+        self.planned = [item.query for item in plan.searches]
+        scheduler = new_scheduler()
+
+        async def search(item):
+            if await manager.search(item, scheduler):
+                self.completed.append(item.query)
+
+        await asyncio.gather(*(search(item) for item in plan.searches))
+
+    def cancel(self):
+        """Stop the speculative searches, e.g. when the user leaves the topic"""
+        self._cancelled.set()
+        if self._loop and self._task and not self.done.is_set():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def take_completed(self, timeout: float = CANCEL_WAIT_SECONDS) -> list[str]:
+        """Cancel the searches still running and return the queries whose summaries are already cached"""
+        self.cancel()
+        self.done.wait(timeout)
+        return list(self.completed)
+
+
+def start_prefetch(query: str) -> Prefetch:
+    return Prefetch(query)
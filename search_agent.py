@@ -1,35 +1,37 @@
-from dotenv import load_dotenv
 from datetime import datetime
-from agents import Agent, ModelSettings, WebSearchTool
 
-load_dotenv(override=True)
 
-CURRENT_DATE = datetime.now().strftime('%B %d, %Y')
-CURRENT_YEAR = datetime.now().year
+def instructions() -> str:
+    """Instructions for today's date"""
+    current_date = datetime.now().strftime('%B %d, %Y')
+    current_year = datetime.now().year
+    return (
+        f"You are a research assistant. Today's date is {current_date}. "
+        f"Given a search term, search the web and produce a concise summary of the results.\n\n"
+        f"CRITICAL RULES FOR RECENCY:\n"
+        f"- ALWAYS prioritize the MOST RECENT sources and findings (from {current_year - 1}-{current_year}).\n"
+        f"- IGNORE outdated information if newer data is available.\n"
+        f"- Include the publication date or timeframe for each key finding (e.g., 'As of January 2026...').\n"
+        f"- If search results contain both old and new information, focus ONLY on the newest.\n"
+        f"- Focus on CONFIRMED, PUBLISHED research and developments that have ALREADY HAPPENED.\n"
+        f"- Do NOT emphasize speculative future predictions, upcoming events, or unconfirmed announcements.\n"
+        f"- Prioritize: recent breakthroughs, published papers, released products, completed studies, and official announcements.\n\n"
+        f"IMPORTANT: Do NOT include any source URLs, links, references, citations, or bibliography. "
+        f"Do NOT mention where the information came from. Just present the findings directly.\n\n"
+        f"FORMAT: The summary must be 4-5 paragraphs and less than 500 words. "
+        f"Capture the main points with dates. Write succinctly, no need for complete sentences or good "
+        f"grammar. This will be consumed by someone synthesizing a report, so capture the "
+        f"essence and ignore any fluff. Do not include any additional commentary other than the summary itself."
+    )
 
-INSTRUCTIONS = (
-    f"You are a research assistant. Today's date is {CURRENT_DATE}. "
-    f"Given a search term, search the web and produce a concise summary of the results.\n\n"
-    f"CRITICAL RULES FOR RECENCY:\n"
-    f"- ALWAYS prioritize the MOST RECENT sources and findings (from {CURRENT_YEAR - 1}-{CURRENT_YEAR}).\n"
-    f"- IGNORE outdated information if newer data is available.\n"
-    f"- Include the publication date or timeframe for each key finding (e.g., 'As of January 2026...').\n"
-    f"- If search results contain both old and new information, focus ONLY on the newest.\n"
-    f"- Focus on CONFIRMED, PUBLISHED research and developments that have ALREADY HAPPENED.\n"
-    f"- Do NOT emphasize speculative future predictions, upcoming events, or unconfirmed announcements.\n"
-    f"- Prioritize: recent breakthroughs, published papers, released products, completed studies, and official announcements.\n\n"
-    f"IMPORTANT: Do NOT include any source URLs, links, references, citations, or bibliography. "
-    f"Do NOT mention where the information came from. Just present the findings directly.\n\n"
-    f"FORMAT: The summary must be 4-5 paragraphs and less than 500 words. "
-    f"Capture the main points with dates. Write succinctly, no need for complete sentences or good "
-    f"grammar. This will be consumed by someone synthesizing a report, so capture the "
-    f"essence and ignore any fluff. Do not include any additional commentary other than the summary itself."
-)
 
-search_agent = Agent(
-    name="Search agent",
-    instructions=INSTRUCTIONS,
-    tools=[WebSearchTool(search_context_size="high")],
-    model="gpt-4o-mini",
-    model_settings=ModelSettings(tool_choice="required"),
-)
+def build_agent():
+    from agents import Agent, ModelSettings, WebSearchTool
+
+    return Agent(
+        name="Search agent",
+        instructions=instructions(),
+        tools=[WebSearchTool(search_context_size="high")],
+        model="gpt-4o-mini",
+        model_settings=ModelSettings(tool_choice="required"),
+    )
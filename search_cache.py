@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import config  # noqa: F401
+
+CACHE_DB_PATH = os.environ.get("SEARCH_CACHE_DB", "search_cache.db")
+
+# Cached summaries expire after a day by default; the search agent is told to
+# prefer the latest sources, so older summaries are not worth serving.
+DEFAULT_TTL_SECONDS = int(os.environ.get("SEARCH_CACHE_TTL", 24 * 60 * 60))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 5000))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivially different queries share a key"""
+    query = query.lower()
+    query = re.sub(r"[^\w\s-]", " ", query)
+    return " ".join(query.split())
+
+
+def recency_bucket(now: Optional[datetime] = None) -> str:
+    """The search agent's instructions embed today's date, so results are only reusable within the same day"""
+    return (now or datetime.now()).strftime("%Y-%m-%d")
+
+
+def cache_key(query: str, bucket: Optional[str] = None) -> str:
+    bucket = bucket or recency_bucket()
+    return hashlib.sha256(f"{bucket}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+
+# Cache files whose tables exist; every manager builds a SearchCache, so the schema is set up once per process
+_init_lock = threading.Lock()
+_initialized: set = set()
+
+
+class SearchCache:
+    """SQLite-backed cache of search summaries with per-entry TTL and LRU eviction"""
+
+    def __init__(self, db_path: str = None, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path or CACHE_DB_PATH
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with _init_lock:
+            if self.db_path in _initialized:
+                return
+            self._create_tables()
+            _initialized.add(self.db_path)
+
+    def _create_tables(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    query TEXT,
+                    result TEXT,
+                    created_at REAL,
+                    expires_at REAL,
+                    last_accessed REAL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_search_cache_last_accessed ON search_cache(last_accessed)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO search_cache_stats (name, value) VALUES ('hits', 0), ('misses', 0)"
+            )
+
+    def get(self, query: str) -> Optional[str]:
+        key = cache_key(query)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM search_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE search_cache SET last_accessed = ? WHERE key = ?", (now, key))
+                conn.execute("UPDATE search_cache_stats SET value = value + 1 WHERE name = 'hits'")
+                return row[0]
+            conn.execute("UPDATE search_cache_stats SET value = value + 1 WHERE name = 'misses'")
+            return None
+
+    def set(self, query: str, result: str, ttl_seconds: int = None):
+        key = cache_key(query)
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, result, created_at, expires_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, query, result, now, now + ttl, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        """Drop expired entries, then the least recently used ones beyond the size cap"""
+        conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            """DELETE FROM search_cache WHERE key IN (
+                   SELECT key FROM search_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM search_cache_stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": entries,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM search_cache")
+            conn.execute("UPDATE search_cache_stats SET value = 0")
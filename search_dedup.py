@@ -0,0 +1,64 @@
+import re
+
+from planner_agent import HOW_MANY_SEARCHES, WebSearchItem, WebSearchPlan
+
+MIN_SEARCHES = 4
+
+# Words that say nothing about a query's topic. Recency words and years are included:
+# every query asks for the latest information, so they only add noise when comparing.
+_STOPWORDS = {
+    "a", "an", "and", "are", "about", "for", "from", "how", "in", "is", "it", "of", "on", "or",
+    "the", "to", "what", "which", "who", "with", "me", "my", "i", "tell", "give", "find",
+    "latest", "recent", "recently", "new", "newest", "current", "today", "now", "update", "updates",
+    "user", "clarification",
+}
+_YEAR = re.compile(r"(19|20)\d\d")
+
+
+def topic_tokens(text: str) -> list[str]:
+    """Normalized words that carry a query's topic, with a crude plural strip"""
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS or _YEAR.fullmatch(word):
+            continue
+        if len(word) > 4 and word.endswith("s"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+_FACET_SEPARATORS = re.compile(r",|;|\band\b|\bvs\.?\b|\bversus\b|\bcompared? (?:to|with)\b", re.IGNORECASE)
+
+
+def search_budget(query: str) -> int:
+    """Number of searches to plan, scaled to how much the query asks for.
+
+    A short single-topic question gets a few searches; longer queries with several
+    facets ("X and Y", comparisons, lists) get up to HOW_MANY_SEARCHES.
+    """
+    words = len(set(topic_tokens(query)))
+    facets = len([part for part in _FACET_SEPARATORS.split(query) if topic_tokens(part)])
+    budget = MIN_SEARCHES + words // 3 + 2 * max(0, facets - 1)
+    return max(MIN_SEARCHES, min(HOW_MANY_SEARCHES, budget))
+
+
+def dedupe_plan(plan: WebSearchPlan) -> tuple[WebSearchPlan, int]:
+    """Merge duplicate searches, keeping the first query of each cluster and every distinct reason.
+
+    Two queries are duplicates when they share the same topic words, i.e. differ only in word
+    order, plurals, years, recency or filler words; they cost two web searches but return the
+    same pages. Any other differing word is a different angle on the topic ("battery cost" and
+    "battery safety") and both searches are kept.
+
+    Returns the reduced plan and how many searches were dropped.
+    """
+    clusters: dict[frozenset, tuple[WebSearchItem, list[str]]] = {}
+    for item in plan.searches:
+        _, reasons = clusters.setdefault(frozenset(topic_tokens(item.query)), (item, []))
+        if item.reason not in reasons:
+            reasons.append(item.reason)
+    searches = [
+        WebSearchItem(query=item.query, reason=" / ".join(reasons))
+        for item, reasons in clusters.values()
+    ]
+    return WebSearchPlan(searches=searches), len(plan.searches) - len(searches)
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+import config  # noqa: F401
+
+# Process-wide limits. Streamlit runs each session's script in its own thread
+# with its own event loop, so the limiter uses thread-safe primitives rather
+# than asyncio ones, which are bound to a single loop.
+MAX_CONCURRENT_SEARCHES = int(os.environ.get("MAX_CONCURRENT_SEARCHES", 4))
+SEARCHES_PER_SECOND = float(os.environ.get("SEARCHES_PER_SECOND", 2.0))
+SEARCH_BURST = int(os.environ.get("SEARCH_BURST", 4))
+MAX_ATTEMPTS = int(os.environ.get("SEARCH_MAX_ATTEMPTS", 4))
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+POLL_INTERVAL_SECONDS = 0.05
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for provider 429s, whichever client library raised them"""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "status", None) == 429:
+        return True
+    return "RateLimit" in type(error).__name__ or "429" in str(error)
+
+
+class TokenBucket:
+    """Thread-safe token bucket that paces request starts to a steady rate"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token if one is available, otherwise return how long to wait for one"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def drain(self):
+        """Empty the bucket so every caller slows down after a 429"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class ConcurrencyLimiter:
+    """Counting semaphore that can be awaited from any thread's event loop"""
+
+    def __init__(self, limit: int):
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    async def acquire(self):
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    def release(self):
+        self._semaphore.release()
+
+
+@dataclass
+class ScheduledResult:
+    item: Any
+    result: Any = None
+    attempts: int = 0
+    queue_wait: float = 0.0
+    error: Optional[BaseException] = None
+
+    @property
+    def dropped(self) -> bool:
+        return self.error is not None
+
+
+@dataclass
+class SearchScheduler:
+    """Runs search calls under a shared concurrency cap and rate limit, retrying with jittered backoff.
+    Without a bucket calls are only capped, not paced."""
+
+    limiter: ConcurrencyLimiter
+    bucket: Optional[TokenBucket]
+    max_attempts: int = MAX_ATTEMPTS
+    base_backoff: float = BASE_BACKOFF_SECONDS
+    max_backoff: float = MAX_BACKOFF_SECONDS
+    dropped: list = field(default_factory=list)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    async def submit(self, item: Any, call: Callable[[Any], Awaitable[Any]]) -> ScheduledResult:
+        scheduled = ScheduledResult(item=item)
+        enqueued_at = time.monotonic()
+        for attempt in range(self.max_attempts):
+            if self.bucket:
+                await self.bucket.acquire()
+            await self.limiter.acquire()
+            if attempt == 0:
+                scheduled.queue_wait = time.monotonic() - enqueued_at
+            scheduled.attempts = attempt + 1
+            try:
+                scheduled.result = await call(item)
+                scheduled.error = None
+                return scheduled
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                scheduled.error = e
+                if is_rate_limit_error(e) and self.bucket:
+                    self.bucket.drain()
+            finally:
+                self.limiter.release()
+            if attempt + 1 < self.max_attempts:
+                await asyncio.sleep(self.backoff(attempt))
+        self.dropped.append(scheduled)
+        return scheduled
+
+
+_shared_limiter = ConcurrencyLimiter(MAX_CONCURRENT_SEARCHES)
+_shared_bucket = TokenBucket(SEARCHES_PER_SECOND, SEARCH_BURST)
+
+
+def new_scheduler() -> SearchScheduler:
+    """A scheduler for one research run that shares the process-wide limits with every other run"""
+    return SearchScheduler(limiter=_shared_limiter, bucket=_shared_bucket)
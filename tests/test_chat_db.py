@@ -0,0 +1,92 @@
+import gc
+import sqlite3
+import threading
+
+import chat_db
+
+
+def run_in_thread(target):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=target()))
+    thread.start()
+    thread.join()
+    # The thread's local storage, and with it its connection lease, is dropped when it exits
+    gc.collect()
+    return result.get("value")
+
+
+def test_migrates_a_database_from_the_original_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chat_sessions (session_id TEXT PRIMARY KEY, created_at TIMESTAMP)")
+    conn.execute("CREATE TABLE chat_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, "
+                 "role TEXT, content TEXT, timestamp TIMESTAMP)")
+    conn.execute("INSERT INTO chat_sessions VALUES ('abcdef123456', '2025-01-01 10:00:00')")
+    conn.execute("INSERT INTO chat_messages (session_id, role, content, timestamp) "
+                 "VALUES ('abcdef123456', 'user', 'perovskite solar efficiency', '2025-01-01 10:00:00')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(chat_db, "DB_PATH", path)
+    try:
+        chat_db.init_db()
+        chat_db.init_db()  # migrating twice is a no-op
+        assert chat_db.get_session_name("abcdef123456") == "Session abcdef12"
+        assert [hit[:2] for hit in chat_db.search_messages("perovskite")] == [("abcdef123456", "Session abcdef12")]
+        assert chat_db.get_chat_history("abcdef123456")[0][:2] == ("user", "perovskite solar efficiency")
+    finally:
+        chat_db.close_connections()
+
+
+def test_search_finds_inline_and_compressed_messages(db):
+    session_id = chat_db.start_session("Batteries")
+    long_report = "# Report\n\n" + "Sodium-ion cells are cheaper to make. " * 100
+    assert len(long_report) > chat_db.COMPRESS_THRESHOLD
+    chat_db.save_messages(session_id, [("user", "sodium ion outlook"), ("assistant", long_report)])
+
+    hits = chat_db.search_messages("sodium")
+    assert {role for _, _, _, role, _ in hits} == {"user", "assistant"}
+    assert all("**" in snippet for *_, snippet in hits)
+    assert chat_db.get_chat_history(session_id)[1][1] == long_report
+    # The last word matches as a prefix, and FTS syntax in the input is taken literally
+    assert len(chat_db.search_messages("outl")) == 1
+    assert chat_db.search_messages('sodium" OR "x') == []
+
+
+def test_deleting_a_session_removes_it_from_the_index(db):
+    kept, deleted = chat_db.start_session("kept"), chat_db.start_session("deleted")
+    chat_db.save_message(kept, "user", "graphene membranes")
+    chat_db.save_message(deleted, "user", "graphene batteries " * 200)
+    chat_db.delete_session(deleted)
+
+    assert [hit[0] for hit in chat_db.search_messages("graphene")] == [kept]
+    with chat_db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM content_store").fetchone()[0] == 0
+
+
+def test_exited_threads_return_their_connection_to_the_pool(db):
+    first = run_in_thread(lambda: id(chat_db.get_connection()))
+    second = run_in_thread(lambda: id(chat_db.get_connection()))
+    assert first == second
+    assert len(chat_db._idle[db]) == 1
+
+
+def test_pool_keeps_at_most_pool_size_idle_connections(db, monkeypatch):
+    monkeypatch.setattr(chat_db, "POOL_SIZE", 2)
+    release = threading.Event()
+    leased = threading.Barrier(5)
+
+    def hold():
+        chat_db.get_connection().execute("SELECT 1")
+        leased.wait()
+        release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    leased.wait()
+    release.set()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert len(chat_db._idle[db]) == 2
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import chat_db
+import research_jobs
+
+
+@pytest.fixture
+def jobs(db):
+    research_jobs.init_jobs()
+    return research_jobs
+
+
+def set_job(job_id: str, **columns):
+    with chat_db.get_connection() as conn:
+        for column, value in columns.items():
+            conn.execute(f"UPDATE research_jobs SET {column} = ? WHERE job_id = ?", (value, job_id))
+
+
+def heartbeat_at(job_id: str):
+    with chat_db.get_connection() as conn:
+        return conn.execute("SELECT heartbeat_at FROM research_jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+
+def test_claims_queued_jobs_oldest_first_and_once(jobs):
+    first = jobs.submit_job("s1", "first", {"query": "first"})
+    second = jobs.submit_job("s2", "second")
+
+    claimed = jobs._claim_job("worker-a")
+    assert (claimed["job_id"], claimed["status"], claimed["options"]) == (first, "running", {"query": "first"})
+    assert jobs._claim_job("worker-b")["job_id"] == second
+    assert jobs._claim_job("worker-a") is None
+    assert jobs.get_active_job("s1")["job_id"] == first
+
+
+def test_cancelling_a_queued_job_finishes_it_at_once(jobs):
+    job_id = jobs.submit_job("s1", "q")
+    jobs.cancel_job(job_id)
+
+    assert jobs.get_job(job_id)["status"] == "cancelled"
+    assert jobs._claim_job("worker-a") is None
+    assert [kind for _, kind, _ in jobs.get_events(job_id)] == ["cancelled"]
+
+
+def test_cancelling_a_running_job_leaves_it_to_the_worker(jobs):
+    job_id = jobs.submit_job("s1", "q")
+    jobs._claim_job("worker-a")
+    jobs.cancel_job(job_id)
+
+    assert jobs.get_job(job_id)["status"] == "running"
+    assert jobs._cancel_requested(job_id)
+
+
+def test_retry_queues_a_cancelled_job_again(jobs):
+    job_id = jobs.submit_job("s1", "q")
+    jobs.cancel_job(job_id)
+    jobs.retry_job(job_id)
+
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["cancel_requested"]) == ("queued", 0)
+    assert jobs._claim_job("worker-a")["job_id"] == job_id
+
+
+def test_only_jobs_without_a_recent_heartbeat_are_requeued(jobs):
+    stale, live = jobs.submit_job("s1", "stale"), jobs.submit_job("s2", "live")
+    jobs._claim_job("worker-a")
+    jobs._claim_job("worker-a")
+    set_job(stale, heartbeat_at=datetime.utcnow() - timedelta(seconds=jobs.STALE_AFTER_SECONDS + 1))
+    jobs._requeue_stale_jobs()
+
+    assert jobs.get_job(stale)["status"] == "queued"
+    assert jobs.get_job(live)["status"] == "running"
+    assert jobs._claim_job("worker-b")["job_id"] == stale
+
+
+def test_heartbeat_refreshes_running_jobs_and_the_worker(jobs):
+    job_id = jobs.submit_job("s1", "q")
+    jobs._claim_job("worker-a")
+    set_job(job_id, heartbeat_at=datetime(2000, 1, 1))
+
+    async def beat_once():
+        task = asyncio.create_task(jobs._heartbeat("worker-a", {job_id}))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(beat_once())
+    assert heartbeat_at(job_id) > str(datetime.utcnow() - timedelta(minutes=1))
+    assert jobs.worker_alive()
+
+
+def test_run_job_stops_a_job_cancelled_while_running(jobs, monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_INTERVAL_SECONDS", 0.01)
+
+    async def endless(job):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(jobs, "_consume_run", endless)
+    job_id = jobs.submit_job("s1", "q")
+    job = jobs._claim_job("worker-a")
+    jobs.cancel_job(job_id)
+
+    asyncio.run(asyncio.wait_for(jobs.run_job(job), timeout=5))
+    assert jobs.get_job(job_id)["status"] == "cancelled"
+
+
+def test_a_worker_shutting_down_requeues_its_jobs(jobs, monkeypatch):
+    async def endless(job):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(jobs, "_consume_run", endless)
+    job_id = jobs.submit_job("s1", "q")
+    job = jobs._claim_job("worker-a")
+
+    async def shut_down():
+        task = asyncio.create_task(jobs.run_job(job))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(shut_down())
+    assert jobs.get_job(job_id)["status"] == "queued"
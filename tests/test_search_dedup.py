@@ -0,0 +1,37 @@
+from planner_agent import WebSearchItem, WebSearchPlan
+from search_dedup import dedupe_plan
+
+
+def plan(*queries: str) -> WebSearchPlan:
+    return WebSearchPlan(searches=[WebSearchItem(query=query, reason=f"reason {i}") for i, query in enumerate(queries)])
+
+
+def test_keeps_different_angles_of_one_topic():
+    queries = [
+        "solid state battery cost 2026",
+        "solid state battery safety 2026",
+        "solid state battery recycling 2025",
+        "solid state battery Toyota 2026",
+    ]
+    deduped, merged = dedupe_plan(plan(*queries))
+    assert merged == 0
+    assert [item.query for item in deduped.searches] == queries
+
+
+def test_keeps_regions_and_comparisons_apart():
+    deduped, merged = dedupe_plan(plan(
+        "EV charging market 2026", "EV charging market Europe 2026", "EV charging market vs hydrogen 2026",
+    ))
+    assert merged == 0
+
+
+def test_merges_queries_differing_only_in_years_recency_and_word_order():
+    deduped, merged = dedupe_plan(plan(
+        "solid state battery cost 2026",
+        "latest solid state battery costs 2025",
+        "costs of the solid state battery",
+        "solid state battery safety",
+    ))
+    assert merged == 2
+    assert [item.query for item in deduped.searches] == ["solid state battery cost 2026", "solid state battery safety"]
+    assert deduped.searches[0].reason == "reason 0 / reason 1 / reason 2"